@@ -42,9 +42,19 @@ except (ImportError, ModuleNotFoundError):
 # 3. 32位字符串就是数据库 ID
 NOTION_DATABASE_ID = "your_notion_database_id"
 
-# 如果没有数据库，可以设置父页面 ID，程序会自动创建数据库
+# 如果没有数据库，可以设置父页面 ID，程序会在该页面下查找或自动创建数据库（结果缓存在本地状态库）
 # NOTION_PARENT_PAGE_ID = "your_parent_page_id"
 
+# 使用已有数据库且属性名与默认的中文属性名不同时，按字段覆盖属性名（启动时会校验名称与类型）
+# 可用字段：title(书名) author(作者) book_id(书籍ID) category(分类) read_progress(阅读进度)
+#          rating(评分) finish_reading(完成阅读) last_read_time(最后阅读时间)；可选字段设为 "" 表示不写入
+# NOTION_PROPERTY_NAMES = {"title": "Name", "book_id": "BookID"}
+
+# 划线数据库（可选）：设置后每条划线额外写入为该数据库中的一行，并关联到书籍页面
+# 数据库需包含属性：划线ID(文本) 划线内容(标题) 书籍(关联到书籍数据库) 章节(文本) 创建时间(日期)
+# 首次启用或写入失败时，内容未变化的书籍也会在下次同步时补写划线
+# NOTION_HIGHLIGHTS_DATABASE_ID = "your_highlights_database_id"
+
 # ================================
 # 同步配置
 # ================================
@@ -60,11 +70,23 @@ SYNC_READING_NOTES = True      # 是否同步读书笔记
 BATCH_SIZE = 5                 # 每批次同步的书籍数量
 BATCH_DELAY = 2                # 批次之间的延迟（秒）
 
+# 流水线并发设置（抓取微信读书与写入 Notion 并行进行）
+WEREAD_FETCH_CONCURRENCY = 2   # 并发抓取微信读书数据的 worker 数
+NOTION_WRITE_CONCURRENCY = 2   # 并发写入 Notion 的 worker 数
+SYNC_QUEUE_SIZE = 10           # 抓取端与写入端之间的缓冲队列容量
+SYNC_DEADLINE = ""             # 时间预算（如 "25m"），为空表示不限制；也可用 --deadline 或环境变量指定
+
+# 本地同步状态（用于跳过未变化的书籍）
+STATE_DB_FILE = "logs/sync_state.db"  # 同步状态库路径（SQLite）
+
 # ================================
 # API 限制配置
 # ================================
 # 微信读书 API 限制
-WEREAD_RATE_LIMIT = 5          # 每60秒最多请求次数
+WEREAD_RATE_LIMIT = 5          # 每60秒的初始请求次数（运行中按响应自适应调整）
+WEREAD_MIN_RATE_LIMIT = 1      # 自适应限流的速率下限（每60秒）
+WEREAD_MAX_RATE_LIMIT = None   # 自适应限流的速率上限（每60秒），默认等于 WEREAD_RATE_LIMIT
+WEREAD_RATE_BURST = 3          # 空闲后允许连续发出的请求数（1 表示严格按间隔发送）
 WEREAD_REQUEST_DELAY = 1       # 请求之间的延迟（秒）
 
 # Notion API 限制
@@ -84,14 +106,15 @@ LOG_BACKUP_COUNT = 5           # 保留的日志文件数量
 # 高级配置
 # ================================
 # 数据过滤
-MIN_NOTE_LENGTH = 10           # 最小笔记长度（字符）
+MIN_NOTE_LENGTH = 10           # 最小笔记长度（字符），更短的划线/想法不写入 Notion
 EXCLUDE_PRIVATE_NOTES = False  # 是否排除私有笔记
-EXCLUDE_EMPTY_BOOKS = True     # 是否排除没有内容的书籍
+EXCLUDE_EMPTY_BOOKS = True     # 是否排除没有内容（无笔记且未开始阅读）的书籍
 
 # 重试配置
 MAX_RETRIES = 3                # 最大重试次数
 RETRY_DELAY = 2                # 重试延迟（秒）
 
 # 缓存配置
-ENABLE_CACHE = True            # 是否启用缓存
-CACHE_EXPIRE_TIME = 3600       # 缓存过期时间（秒） 
\ No newline at end of file
+ENABLE_CACHE = True            # 是否缓存书籍信息、章节、热门书评等变化缓慢的接口
+CACHE_EXPIRE_TIME = 3600       # 默认缓存过期时间（秒）；书籍信息 7 天、章节 30 天（书籍更新时失效）
+CACHE_FILE = "logs/weread_cache.db"  # 响应缓存路径（SQLite） 
\ No newline at end of file
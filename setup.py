@@ -124,13 +124,6 @@ def check_dependencies():
         print("❌ notion-client 未安装")
         return False
     
-    try:
-        import aiolimiter
-        print("✅ aiolimiter 已安装")
-    except ImportError:
-        print("❌ aiolimiter 未安装")
-        return False
-    
     print("✅ 所有依赖都已安装")
     return True
 
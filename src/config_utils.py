@@ -79,3 +79,16 @@ def validate_required_config(fallback_module=None) -> Tuple[bool, Dict[str, Opti
     return True, cfg, "OK"
 
 
+def parse_duration(value) -> Optional[float]:
+    """将 "25m"、"90s"、"1h" 或纯数字（秒）解析为秒数；空值返回 None。"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if not text:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
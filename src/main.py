@@ -2,6 +2,7 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -18,8 +19,11 @@ except Exception:
     # config 可选；若缺失，在校验阶段用环境变量兜底
     config = None  # type: ignore
 
+from src.models import SyncFilters
 from src.sync.service import SyncService
-from src.config_utils import validate_required_config, get_config_value
+from src.sync.state import SyncStateStore, DEFAULT_STATE_PATH
+from src.weread.cache import DEFAULT_CACHE_PATH
+from src.config_utils import validate_required_config, get_config_value, parse_duration
 
 
 def setup_logging():
@@ -60,8 +64,112 @@ def setup_logging():
         print(f"⚠️  无法设置文件日志: {e}")
 
 
-async def sync_all_books():
-    """同步所有书籍"""
+def _get_cache_path():
+    """根据配置返回响应缓存路径，未启用缓存时返回 None"""
+    if not getattr(config, 'ENABLE_CACHE', False):
+        return None
+    return getattr(config, 'CACHE_FILE', DEFAULT_CACHE_PATH)
+
+
+def _get_sync_filters() -> SyncFilters:
+    """根据配置构建书籍与笔记的筛选条件"""
+    return SyncFilters(
+        include_books_without_notes=getattr(config, 'SYNC_ALL_BOOKS', True),
+        exclude_empty_books=getattr(config, 'EXCLUDE_EMPTY_BOOKS', False),
+        sync_reading_notes=getattr(config, 'SYNC_READING_NOTES', True),
+        sync_book_reviews=getattr(config, 'SYNC_BOOK_REVIEWS', True),
+        sync_book_covers=getattr(config, 'SYNC_BOOK_COVERS', True),
+        min_note_length=getattr(config, 'MIN_NOTE_LENGTH', 0),
+        exclude_private_notes=getattr(config, 'EXCLUDE_PRIVATE_NOTES', False)
+    )
+
+
+def _get_highlights_database_id() -> Optional[str]:
+    """返回划线数据库 ID（环境变量优先），未配置时返回 None"""
+    return os.getenv('NOTION_HIGHLIGHTS_DATABASE_ID') or getattr(config, 'NOTION_HIGHLIGHTS_DATABASE_ID', None) or None
+
+
+def _get_deadline_at(started_at: float, deadline: Optional[str] = None) -> Optional[float]:
+    """
+    计算同步截止时间：命令行 --deadline 优先，其次 SYNC_DEADLINE 环境变量或配置
+    
+    Args:
+        started_at: 进程启动时间（time.monotonic() 时间戳），时间预算从此刻起算
+        deadline: 命令行指定的时间预算
+        
+    Returns:
+        截止时间（time.monotonic() 时间戳），未设置时间预算时返回 None
+    """
+    value = deadline or os.getenv('SYNC_DEADLINE') or getattr(config, 'SYNC_DEADLINE', None)
+    budget = parse_duration(value)
+    return started_at + budget if budget else None
+
+
+async def _resolve_database_id(cfg) -> Optional[str]:
+    """
+    获取书籍数据库 ID
+    
+    优先使用配置的 NOTION_DATABASE_ID；未配置时在 NOTION_PARENT_PAGE_ID 下查找或创建书籍数据库，
+    结果缓存在本地状态库中，之后的运行直接复用同一个数据库。
+    """
+    notion_database_id = cfg.get("NOTION_DATABASE_ID")
+    notion_parent_page_id = cfg.get("NOTION_PARENT_PAGE_ID")
+    if notion_database_id or not notion_parent_page_id:
+        return notion_database_id
+    
+    from src.notion.client import NotionClient
+    state_store = SyncStateStore(getattr(config, 'STATE_DB_FILE', DEFAULT_STATE_PATH))
+    try:
+        cached_database_id = state_store.get_database(notion_parent_page_id)
+        notion = NotionClient(
+            token=cfg["NOTION_TOKEN"],
+            database_id=None,
+            rate_limit=getattr(config, 'NOTION_RATE_LIMIT', 3),
+            property_names=getattr(config, 'NOTION_PROPERTY_NAMES', None)
+        )
+        notion_database_id = await notion.create_database_if_not_exists(
+            notion_parent_page_id,
+            database_id=cached_database_id
+        )
+        state_store.save_database(notion_parent_page_id, notion_database_id)
+        state_store.save_schema(notion.schema)
+        return notion_database_id
+    finally:
+        state_store.close()
+
+
+def _parse_args(argv):
+    """
+    拆分命令行中的选项与位置参数
+    
+    Returns:
+        (选项 → 值, 位置参数)；不带值的选项值为 None，带值的选项支持 "--key value" 与 "--key=value"
+    """
+    value_options = ('--deadline',)
+    options = {}
+    args = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith('--') and arg != '--help':
+            key, _, value = arg.partition('=')
+            if key in value_options and not value and i + 1 < len(argv):
+                i += 1
+                value = argv[i]
+            options[key] = value or None
+        else:
+            args.append(arg)
+        i += 1
+    return options, args
+
+
+async def sync_all_books(
+    force: bool = False,
+    resume: bool = False,
+    deadline: Optional[str] = None,
+    started_at: Optional[float] = None
+):
+    """同步所有书籍（时间预算从 started_at 起算，默认为调用时刻）"""
     logger = logging.getLogger(__name__)
     
     try:
@@ -72,25 +180,37 @@ async def sync_all_books():
             return False
         weread_cookie = cfg["WEREAD_COOKIE"]
         notion_token = cfg["NOTION_TOKEN"]
-        notion_database_id = cfg.get("NOTION_DATABASE_ID")
-        notion_parent_page_id = cfg.get("NOTION_PARENT_PAGE_ID")
-        
-        # 若未提供数据库ID，则尝试基于父页面创建
-        if not notion_database_id and notion_parent_page_id:
-            from src.notion.client import NotionClient
-            notion_tmp = NotionClient(token=notion_token, database_id=None)
-            notion_database_id = await notion_tmp.create_database_if_not_exists(notion_parent_page_id)
+        # 若未提供数据库ID，则在父页面下查找或创建（结果缓存在本地）
+        notion_database_id = await _resolve_database_id(cfg)
 
         # 创建同步服务
         async with SyncService(
             weread_cookie=weread_cookie,
             notion_token=notion_token,
-            notion_database_id=notion_database_id  # type: ignore[arg-type]
+            notion_database_id=notion_database_id,  # type: ignore[arg-type]
+            weread_rate_limit=getattr(config, 'WEREAD_RATE_LIMIT', 5),
+            notion_rate_limit=getattr(config, 'NOTION_RATE_LIMIT', 3),
+            weread_min_rate_limit=getattr(config, 'WEREAD_MIN_RATE_LIMIT', None),
+            weread_max_rate_limit=getattr(config, 'WEREAD_MAX_RATE_LIMIT', None),
+            weread_rate_burst=getattr(config, 'WEREAD_RATE_BURST', 1),
+            fetch_concurrency=getattr(config, 'WEREAD_FETCH_CONCURRENCY', 2),
+            write_concurrency=getattr(config, 'NOTION_WRITE_CONCURRENCY', 2),
+            queue_size=getattr(config, 'SYNC_QUEUE_SIZE', 10),
+            state_path=getattr(config, 'STATE_DB_FILE', DEFAULT_STATE_PATH),
+            cache_path=_get_cache_path(),
+            cache_expire_time=getattr(config, 'CACHE_EXPIRE_TIME', 3600),
+            filters=_get_sync_filters(),
+            notion_property_names=getattr(config, 'NOTION_PROPERTY_NAMES', None),
+            highlights_database_id=_get_highlights_database_id()
         ) as sync_service:
             
+            # 先校验 Notion 数据库结构，配置错误时不再请求微信读书
+            await sync_service.validate_schema()
+            
             # 获取同步状态
             logger.info("📊 检查同步状态...")
-            status = await sync_service.get_sync_status()
+            # 同步时会完整扫描一次 Notion 数据库，这里使用本地页面索引计数
+            status = await sync_service.get_sync_status(count_pages=False)
             
             if 'error' in status:
                 logger.error(f"❌ 获取同步状态失败: {status['error']}")
@@ -105,18 +225,27 @@ async def sync_all_books():
             
             results = await sync_service.sync_all_books(
                 include_finished=include_finished,
-                include_unfinished=include_unfinished
+                include_unfinished=include_unfinished,
+                force=force,
+                resume=resume,
+                deadline_at=_get_deadline_at(
+                    started_at if started_at is not None else time.monotonic(), deadline
+                )
             )
             
             # 统计结果
             success_count = sum(1 for r in results if r.success)
+            skipped_count = sum(1 for r in results if r.skipped)
             failed_count = len(results) - success_count
             total_notes = sum(r.notes_synced for r in results)
             total_reviews = sum(r.reviews_synced for r in results)
             
             logger.info(f"🎉 同步完成!")
             logger.info(f"   ✅ 成功: {success_count} 本")
+            logger.info(f"   ⏭️  未变化跳过: {skipped_count} 本")
             logger.info(f"   ❌ 失败: {failed_count} 本")
+            if sync_service.deferred_books:
+                logger.info(f"   ⏳ 推迟到下次: {sync_service.deferred_books} 本")
             logger.info(f"   📝 笔记: {total_notes} 条")
             logger.info(f"   💭 书评: {total_reviews} 条")
             
@@ -145,19 +274,25 @@ async def sync_single_book(book_id: str):
             return False
         weread_cookie = cfg["WEREAD_COOKIE"]
         notion_token = cfg["NOTION_TOKEN"]
-        notion_database_id = cfg.get("NOTION_DATABASE_ID")
-        notion_parent_page_id = cfg.get("NOTION_PARENT_PAGE_ID")
-        
-        if not notion_database_id and notion_parent_page_id:
-            from src.notion.client import NotionClient
-            notion_tmp = NotionClient(token=notion_token, database_id=None)
-            notion_database_id = await notion_tmp.create_database_if_not_exists(notion_parent_page_id)
+        # 若未提供数据库ID，则在父页面下查找或创建（结果缓存在本地）
+        notion_database_id = await _resolve_database_id(cfg)
 
         # 创建同步服务
         async with SyncService(
             weread_cookie=weread_cookie,
             notion_token=notion_token,
-            notion_database_id=notion_database_id  # type: ignore[arg-type]
+            notion_database_id=notion_database_id,  # type: ignore[arg-type]
+            weread_rate_limit=getattr(config, 'WEREAD_RATE_LIMIT', 5),
+            notion_rate_limit=getattr(config, 'NOTION_RATE_LIMIT', 3),
+            weread_min_rate_limit=getattr(config, 'WEREAD_MIN_RATE_LIMIT', None),
+            weread_max_rate_limit=getattr(config, 'WEREAD_MAX_RATE_LIMIT', None),
+            weread_rate_burst=getattr(config, 'WEREAD_RATE_BURST', 1),
+            state_path=getattr(config, 'STATE_DB_FILE', DEFAULT_STATE_PATH),
+            cache_path=_get_cache_path(),
+            cache_expire_time=getattr(config, 'CACHE_EXPIRE_TIME', 3600),
+            filters=_get_sync_filters(),
+            notion_property_names=getattr(config, 'NOTION_PROPERTY_NAMES', None),
+            highlights_database_id=_get_highlights_database_id()
         ) as sync_service:
             
             result = await sync_service.sync_book_by_id(book_id)
@@ -187,19 +322,16 @@ async def show_status():
             return False
         weread_cookie = cfg["WEREAD_COOKIE"]
         notion_token = cfg["NOTION_TOKEN"]
-        notion_database_id = cfg.get("NOTION_DATABASE_ID")
-        notion_parent_page_id = cfg.get("NOTION_PARENT_PAGE_ID")
-        
-        if not notion_database_id and notion_parent_page_id:
-            from src.notion.client import NotionClient
-            notion_tmp = NotionClient(token=notion_token, database_id=None)
-            notion_database_id = await notion_tmp.create_database_if_not_exists(notion_parent_page_id)
+        # 若未提供数据库ID，则在父页面下查找或创建（结果缓存在本地）
+        notion_database_id = await _resolve_database_id(cfg)
 
         # 创建同步服务
         async with SyncService(
             weread_cookie=weread_cookie,
             notion_token=notion_token,
-            notion_database_id=notion_database_id  # type: ignore[arg-type]
+            notion_database_id=notion_database_id,  # type: ignore[arg-type]
+            state_path=getattr(config, 'STATE_DB_FILE', DEFAULT_STATE_PATH),
+            notion_property_names=getattr(config, 'NOTION_PROPERTY_NAMES', None)
         ) as sync_service:
             
             status = await sync_service.get_sync_status()
@@ -231,6 +363,9 @@ def show_help():
 
 命令:
   sync          同步所有书籍到 Notion (默认)
+  sync --full   忽略本地同步状态与笔记缓存，强制全量同步
+  sync --resume 从上次中断的运行继续（跳过已完成的书籍，失败的书籍优先）
+  sync --deadline 25m  在时间预算内同步，优先处理有新笔记/最近阅读的书籍，时间不足时停止调度
   sync <book_id>  同步指定书籍
   status        显示同步状态
   check-config  检查配置有效性
@@ -246,6 +381,9 @@ def show_help():
 
 示例:
   python src/main.py sync                    # 同步所有书籍
+  python src/main.py sync --full             # 强制全量同步
+  python src/main.py sync --resume           # 继续上次中断的同步
+  python src/main.py sync --deadline 25m     # 25 分钟内尽量完成同步
   python src/main.py sync 12345678           # 同步指定书籍
   python src/main.py status                  # 查看状态
   
@@ -255,12 +393,15 @@ def show_help():
 
 async def main():
     """主函数"""
+    # 时间预算从进程启动时起算（包括配置校验、数据库解析等准备工作）
+    started_at = time.monotonic()
+    
     # 设置日志
     setup_logging()
     logger = logging.getLogger(__name__)
     
     # 解析命令行参数
-    args = sys.argv[1:]
+    options, args = _parse_args(sys.argv[1:])
     
     if not args or args[0] == "sync":
         if len(args) > 1:
@@ -271,7 +412,12 @@ async def main():
         else:
             # 同步所有书籍
             logger.info("🚀 开始同步所有书籍")
-            success = await sync_all_books()
+            success = await sync_all_books(
+                force='--full' in options,
+                resume='--resume' in options,
+                deadline=options.get('--deadline'),
+                started_at=started_at
+            )
         
         sys.exit(0 if success else 1)
         
@@ -296,13 +442,19 @@ async def main():
                 _ = await wr.get_notebook_list()
 
             # Notion 连接性
-            # 若无数据库ID但提供父页面，则创建
-            notion_db_id = cfg.get("NOTION_DATABASE_ID")
-            if not notion_db_id and cfg.get("NOTION_PARENT_PAGE_ID"):
-                notion_tmp = NotionClient(token=cfg["NOTION_TOKEN"], database_id=None, rate_limit=1)
-                notion_db_id = await notion_tmp.create_database_if_not_exists(cfg["NOTION_PARENT_PAGE_ID"])  # type: ignore[arg-type]
-            notion = NotionClient(token=cfg["NOTION_TOKEN"], database_id=notion_db_id, rate_limit=1)
-            _ = await notion.list_all_books()
+            # 若无数据库ID但提供父页面，则查找或创建
+            notion_db_id = await _resolve_database_id(cfg)
+            notion = NotionClient(
+                token=cfg["NOTION_TOKEN"],
+                database_id=notion_db_id,
+                rate_limit=1,
+                property_names=getattr(config, 'NOTION_PROPERTY_NAMES', None)
+            )
+            # 校验数据库结构与属性映射
+            await notion.load_schema()
+            # 只取一页即可验证连通性，无需遍历整个数据库
+            async for _ in notion.iter_pages(page_size=1):
+                break
 
             print("✅ 配置有效，且在线校验通过")
             sys.exit(0)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -57,4 +57,81 @@ class SyncResult:
     notes_synced: int
     reviews_synced: int
     error_message: Optional[str] = None
-    notion_page_id: Optional[str] = None
\ No newline at end of file
+    notion_page_id: Optional[str] = None
+    skipped: bool = False
+
+
+@dataclass
+class BookPayload:
+    """待写入 Notion 的书籍数据（抓取阶段的产物）"""
+    book_info: BookInfo
+    notes: List[ReadingNote]
+    reviews: List[BookReview]
+    fingerprint: Optional[Dict[str, Any]] = None
+    # 书籍信息是否来自 get_book_info（否则只包含书架/笔记本条目中的字段）
+    detailed: bool = True
+    # 被筛选条件排除的笔记 ID（已写入页面的对应块保持不动）
+    excluded_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BookSyncState:
+    """书籍同步状态数据模型（本地持久化）"""
+    book_id: str
+    notion_page_id: Optional[str] = None
+    note_count: Optional[int] = None
+    review_count: Optional[int] = None
+    bookmark_count: Optional[int] = None
+    sort: Optional[int] = None
+    update_time: Optional[int] = None
+    read_update_time: Optional[int] = None
+    content_hash: Optional[str] = None
+    synced_at: Optional[str] = None
+
+
+@dataclass
+class NoteBlockRef:
+    """笔记/书评与 Notion 块的对应关系（本地持久化）"""
+    item_id: str
+    block_ids: List[str]
+    content_hash: Optional[str] = None
+    inline: bool = False
+
+
+@dataclass
+class SyncCheckpoint:
+    """一次同步运行的检查点（用于中断后续跑）"""
+    run_id: str
+    completed: List[str]
+    failed: List[str]
+    resumed: bool = False
+
+
+@dataclass
+class PendingMutation:
+    """预写日志中尚未确认完成的 Notion 写操作"""
+    mutation_id: int
+    book_id: str
+    operation: str  # create / update
+    payload_hash: str
+    page_id: Optional[str] = None
+
+
+@dataclass
+class DatabaseSchema:
+    """Notion 数据库结构（本地缓存，version 为数据库的最后编辑时间）"""
+    database_id: str
+    version: Optional[str]
+    properties: Dict[str, Dict[str, str]]  # 属性名 → {"id": 属性 ID, "type": 属性类型}
+
+
+@dataclass
+class SyncFilters:
+    """书籍与笔记的筛选条件（在发起单书请求之前生效）"""
+    include_books_without_notes: bool = True   # 是否同步没有笔记的书籍
+    exclude_empty_books: bool = False          # 是否排除没有笔记且未开始阅读的书籍
+    sync_reading_notes: bool = True            # 是否同步划线和想法
+    sync_book_reviews: bool = True             # 是否同步书评
+    sync_book_covers: bool = True              # 是否在新页面中添加封面
+    min_note_length: int = 0                   # 笔记的最小长度（字符）
+    exclude_private_notes: bool = False        # 是否排除私密笔记
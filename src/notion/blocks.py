@@ -0,0 +1,164 @@
+from typing import Any, Dict, List, Optional
+
+from ..models import ReadingNote, BookReview
+
+
+# Notion API 的请求限制
+MAX_BLOCKS_PER_REQUEST = 100   # 每次请求最多 100 个块
+MAX_RICH_TEXT_LENGTH = 2000    # 每个 rich_text 元素最多 2000 个字符
+MAX_RICH_TEXT_ITEMS = 100      # 每个 rich_text 数组最多 100 个元素
+
+
+def split_text(content: str, limit: int = MAX_RICH_TEXT_LENGTH) -> List[str]:
+    """
+    将文本切分为不超过长度限制的片段
+
+    Notion 按 UTF-16 编码单元计算长度，因此表情等非 BMP 字符按 2 计。
+
+    Args:
+        content: 原始文本
+        limit: 单个片段的最大长度
+
+    Returns:
+        文本片段列表（至少包含一个元素）
+    """
+    content = content or ""
+    if len(content.encode("utf-16-le")) == 2 * len(content):
+        # 全部为 BMP 字符时可直接按下标切分
+        return [content[i:i + limit] for i in range(0, len(content), limit)] or [""]
+
+    segments = []
+    current = []
+    current_length = 0
+    for char in content:
+        char_length = 2 if ord(char) > 0xFFFF else 1
+        if current_length + char_length > limit:
+            segments.append("".join(current))
+            current = []
+            current_length = 0
+        current.append(char)
+        current_length += char_length
+    segments.append("".join(current))
+    return segments
+
+
+def rich_text(content: str, annotations: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    构建符合长度限制的 rich_text 数组
+
+    Args:
+        content: 文本内容
+        annotations: 文本样式
+
+    Returns:
+        rich_text 元素列表
+    """
+    items = []
+    for segment in split_text(content):
+        item: Dict[str, Any] = {
+            "type": "text",
+            "text": {
+                "content": segment
+            }
+        }
+        if annotations:
+            item["annotations"] = annotations
+        items.append(item)
+    return items
+
+
+def text_blocks(
+    block_type: str,
+    content: str,
+    annotations: Optional[Dict[str, Any]] = None,
+    **extra: Any
+) -> List[Dict[str, Any]]:
+    """
+    构建文本类块；超长文本会拆成多个相同类型的块
+
+    Args:
+        block_type: 块类型（paragraph、heading_2、callout、quote 等）
+        content: 文本内容
+        annotations: 文本样式
+        **extra: 块的其他字段（如 callout 的 icon）
+
+    Returns:
+        块列表
+    """
+    segments = rich_text(content, annotations)
+    blocks = []
+    for i in range(0, len(segments), MAX_RICH_TEXT_ITEMS):
+        blocks.append({
+            "object": "block",
+            "type": block_type,
+            block_type: {
+                "rich_text": segments[i:i + MAX_RICH_TEXT_ITEMS],
+                **extra
+            }
+        })
+    return blocks
+
+
+def image_block(url: str) -> Dict[str, Any]:
+    """构建外链图片块"""
+    return {
+        "object": "block",
+        "type": "image",
+        "image": {
+            "type": "external",
+            "external": {
+                "url": url
+            }
+        }
+    }
+
+
+def divider_block() -> Dict[str, Any]:
+    """构建分隔线块"""
+    return {
+        "object": "block",
+        "type": "divider",
+        "divider": {}
+    }
+
+
+def note_blocks(note: ReadingNote, inline: bool = False) -> List[Dict[str, Any]]:
+    """
+    构建单条笔记的 callout 块
+
+    Args:
+        note: 读书笔记
+        inline: 是否在内容前附带章节名（追加到页面末尾、脱离章节标题时使用）
+
+    Returns:
+        块列表
+    """
+    note_type_emoji = "📝" if note.note_type == "review" else "📖"
+    content = f"[{note.chapter_title}] {note.content}" if inline else note.content
+    return text_blocks(
+        "callout",
+        content,
+        icon={
+            "type": "emoji",
+            "emoji": note_type_emoji
+        }
+    )
+
+
+def review_blocks(review: BookReview) -> List[Dict[str, Any]]:
+    """构建单条书评的引用块"""
+    return text_blocks("quote", review.content)
+
+
+def batch_blocks(blocks: List[Dict[str, Any]], size: int = MAX_BLOCKS_PER_REQUEST) -> List[List[Dict[str, Any]]]:
+    """
+    按请求上限对块分批，保持原有顺序
+
+    Args:
+        blocks: 块列表
+        size: 每批最多块数
+
+    Returns:
+        分批后的块列表
+    """
+    return [blocks[i:i + size] for i in range(0, len(blocks), size)]
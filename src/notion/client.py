@@ -1,17 +1,94 @@
 import os
 import asyncio
-from typing import Dict, List, Optional, Any
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Any
 from datetime import datetime
+from urllib.parse import unquote
 from notion_client import AsyncClient
-from aiolimiter import AsyncLimiter
+from notion_client.errors import APIErrorCode, APIResponseError, HTTPResponseError
 
-from ..models import BookInfo, ReadingNote, BookReview
+from ..models import BookInfo, ReadingNote, BookReview, NoteBlockRef, DatabaseSchema
+from .blocks import batch_blocks, divider_block, image_block, rich_text, text_blocks
+from .rate_limiter import NotionRateLimiter
+from .reconcile import (
+    NOTES_HEADING,
+    PageItem,
+    build_page_items,
+    notes_heading_text,
+    plan_reconciliation,
+    text_hash,
+)
+from .schema import (
+    BOOK_FIELDS,
+    PROGRESS_FIELDS,
+    SchemaError,
+    check_highlight_schema,
+    resolve_properties,
+    schema_from_database,
+)
+
+
+# 自动创建的书籍数据库标题与属性（查找已有数据库时按属性名与类型匹配）
+BOOK_DATABASE_TITLE = "📚 我的书架"
+BOOK_DATABASE_PROPERTIES: Dict[str, Dict[str, Any]] = {
+    "书名": {
+        "title": {}
+    },
+    "作者": {
+        "rich_text": {}
+    },
+    "书籍ID": {
+        "rich_text": {}
+    },
+    "分类": {
+        "select": {
+            "options": [
+                {"name": "小说", "color": "blue"},
+                {"name": "非虚构", "color": "green"},
+                {"name": "技术", "color": "orange"},
+                {"name": "历史", "color": "purple"},
+                {"name": "哲学", "color": "red"},
+                {"name": "科学", "color": "yellow"},
+                {"name": "传记", "color": "pink"},
+                {"name": "其他", "color": "gray"}
+            ]
+        }
+    },
+    "阅读进度": {
+        "number": {
+            "format": "percent"
+        }
+    },
+    "评分": {
+        "number": {
+            "format": "number"
+        }
+    },
+    "完成阅读": {
+        "checkbox": {}
+    },
+    "最后阅读时间": {
+        "date": {}
+    }
+}
+
+# 收到 429 时的最大重试次数，以及缺少 Retry-After 时的默认等待时间（秒）
+THROTTLE_MAX_RETRIES = 5
+DEFAULT_RETRY_AFTER = 1.0
 
 
 class NotionClient:
     """Notion API 客户端"""
     
-    def __init__(self, token: str = None, database_id: str = None, rate_limit: int = 3):
+    def __init__(
+        self,
+        token: str = None,
+        database_id: str = None,
+        rate_limit: int = 3,
+        property_names: Optional[Dict[str, str]] = None,
+        highlights_database_id: Optional[str] = None
+    ):
         """
         初始化 Notion 客户端
         
@@ -19,11 +96,28 @@ class NotionClient:
             token: Notion API Token
             database_id: 书籍数据库 ID
             rate_limit: 每秒最多请求次数
+            property_names: 书籍字段 → 自定义属性名（覆盖默认的中文属性名）
+            highlights_database_id: 划线数据库 ID；设置后每条划线额外写入为该数据库中的一行
         """
         self.token = token or self._get_token_from_env()
         self.database_id = database_id or os.getenv('NOTION_DATABASE_ID')
         self.client = AsyncClient(auth=self.token)
-        self.rate_limiter = AsyncLimiter(max_rate=rate_limit, time_period=1)
+        self.rate_limiter = NotionRateLimiter(rate=rate_limit)
+        self.logger = logging.getLogger(__name__)
+        # 书籍ID → 页面 ID 索引；page_index_complete 表示索引来自本次运行的完整扫描
+        self.page_index: Optional[Dict[str, str]] = None
+        self.page_index_complete = False
+        # 属性名 → 属性 ID（用于 filter_properties）
+        self._property_ids: Optional[Dict[str, str]] = None
+        # 数据库结构与书籍字段 → 属性的映射（load_schema 后按实际结构校验）
+        self.property_names = property_names or {}
+        self.schema: Optional[DatabaseSchema] = None
+        self.properties = resolve_properties(None, self.property_names)
+        # 划线数据库与划线ID → 页面 ID 索引（load_highlight_index 后填充）
+        self.highlights_database_id = highlights_database_id
+        self.highlight_index: Dict[str, str] = {}
+        # 完整扫描时发现的重复页面：书籍ID → 多余的页面 ID 列表
+        self.duplicate_pages: Dict[str, List[str]] = {}
     
     def _get_token_from_env(self) -> str:
         """从环境变量获取 Notion Token"""
@@ -32,226 +126,218 @@ class NotionClient:
             raise ValueError("请设置 NOTION_TOKEN 环境变量或传入 token 参数")
         return token
     
+    async def _call(self, method, **kwargs) -> Any:
+        """
+        发送一次 Notion API 请求
+        
+        每次请求单独获取一个令牌；收到 429 时按 Retry-After 全局暂停限流器后透明重试。
+        
+        Args:
+            method: notion-client 的接口方法，如 self.client.pages.create
+            **kwargs: 接口参数
+            
+        Returns:
+            接口响应
+        """
+        for attempt in range(THROTTLE_MAX_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            try:
+                return await method(**kwargs)
+            except HTTPResponseError as e:
+                if e.status != 429 or attempt == THROTTLE_MAX_RETRIES:
+                    raise
+                retry_after = self._parse_retry_after(e.headers)
+                self.logger.warning(f"⏳ Notion 限流，{retry_after:.1f} 秒后重试 ({attempt + 1}/{THROTTLE_MAX_RETRIES})")
+                self.rate_limiter.pause(retry_after)
+    
+    @staticmethod
+    def _parse_retry_after(headers) -> float:
+        """解析 Retry-After 响应头（秒），缺失或无法解析时返回默认值"""
+        try:
+            return max(0.0, float(headers.get("Retry-After")))
+        except (AttributeError, TypeError, ValueError):
+            return DEFAULT_RETRY_AFTER
+    
     # database_id 可选；若缺失可以通过 create_database_if_not_exists 创建
     
-    async def create_book_page(self, book_info: BookInfo, notes: List[ReadingNote] = None, reviews: List[BookReview] = None) -> Dict[str, Any]:
+    async def create_book_page(
+        self,
+        book_info: BookInfo,
+        notes: List[ReadingNote] = None,
+        reviews: List[BookReview] = None,
+        on_created: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
         """
         创建书籍页面
         
+        页面随第一批（最多 100 个）块一起创建，其余块按顺序分批追加。
+        
         Args:
             book_info: 书籍信息
             notes: 读书笔记列表
             reviews: 书评列表
+            on_created: 页面创建成功后（追加剩余块之前）以页面 ID 调用的回调
             
         Returns:
-            创建的页面信息
+            创建的页面信息，其中 item_blocks 为笔记/书评 ID 到所创建块的对应关系
         """
-        async with self.rate_limiter:
-            # 构建页面属性
-            properties = {
-                "书名": {
-                    "title": [
-                        {
-                            "text": {
-                                "content": book_info.title
-                            }
-                        }
-                    ]
-                },
-                "作者": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": book_info.author or ""
-                            }
-                        }
-                    ]
-                },
-                "书籍ID": {
-                    "rich_text": [
-                        {
-                            "text": {
-                                "content": book_info.book_id
-                            }
-                        }
-                    ]
-                },
-                "分类": {
-                    "select": {
-                        "name": book_info.category or "未分类"
-                    } if book_info.category else None
-                },
-                "阅读进度": {
-                    "number": book_info.read_progress
-                } if book_info.read_progress is not None else None,
-                "评分": {
-                    "number": book_info.rating
-                } if book_info.rating is not None else None,
-                "完成阅读": {
-                    "checkbox": book_info.finish_reading == 1
-                } if book_info.finish_reading is not None else None,
-                "最后阅读时间": {
-                    "date": {
-                        "start": book_info.last_read_time.isoformat()
-                    }
-                } if book_info.last_read_time else None
-            }
-            
-            # 过滤掉 None 值
-            properties = {k: v for k, v in properties.items() if v is not None}
-            
-            # 构建页面内容
-            children = []
-            
-            # 添加书籍封面
-            if book_info.cover:
-                children.append({
-                    "object": "block",
-                    "type": "image",
-                    "image": {
-                        "type": "external",
-                        "external": {
-                            "url": book_info.cover
-                        }
-                    }
-                })
-            
-            # 添加书籍简介
-            if book_info.intro:
-                children.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": "📖 书籍简介"
-                                }
-                            }
-                        ]
-                    }
-                })
-                children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": book_info.intro
-                                }
-                            }
-                        ]
-                    }
-                })
+        # 构建页面属性（使用预先编译的属性映射）
+        properties = self.properties.build(book_info)
+        
+        # 构建页面内容；keys 与 children 一一对应，记录块所属的笔记/书评 ID
+        children = []
+        keys: List[Optional[str]] = []
+        
+        def add(blocks: List[Dict[str, Any]], key: Optional[str] = None):
+            children.extend(blocks)
+            keys.extend([key] * len(blocks))
+        
+        # 添加书籍封面
+        if book_info.cover:
+            add([image_block(book_info.cover)])
+        
+        # 添加书籍简介
+        if book_info.intro:
+            add(text_blocks("heading_2", "📖 书籍简介"))
+            add(text_blocks("paragraph", book_info.intro))
+        
+        # 按章节分组的笔记，书评排在最后
+        items = build_page_items(notes, reviews)
+        
+        # 添加读书笔记
+        if notes:
+            add(text_blocks("heading_2", notes_heading_text(len(notes))), NOTES_HEADING)
             
-            # 添加读书笔记
-            if notes:
-                children.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": f"📝 读书笔记 ({len(notes)}条)"
-                                }
-                            }
-                        ]
-                    }
-                })
-                
-                # 按章节分组笔记
-                notes_by_chapter = {}
-                for note in notes:
-                    chapter = note.chapter_title or "其他"
-                    if chapter not in notes_by_chapter:
-                        notes_by_chapter[chapter] = []
-                    notes_by_chapter[chapter].append(note)
-                
-                for chapter, chapter_notes in notes_by_chapter.items():
+            chapter = None
+            for item in items:
+                if item.note is None:
+                    continue
+                if item.group != chapter:
                     # 章节标题
-                    children.append({
-                        "object": "block",
-                        "type": "heading_3",
-                        "heading_3": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {
-                                        "content": chapter
-                                    }
-                                }
-                            ]
-                        }
-                    })
-                    
-                    # 章节笔记
-                    for note in chapter_notes:
-                        note_type_emoji = "📝" if note.note_type == "review" else "📖"
-                        children.append({
-                            "object": "block",
-                            "type": "callout",
-                            "callout": {
-                                "icon": {
-                                    "type": "emoji",
-                                    "emoji": note_type_emoji
-                                },
-                                "rich_text": [
-                                    {
-                                        "type": "text",
-                                        "text": {
-                                            "content": note.content
-                                        }
-                                    }
-                                ]
-                            }
-                        })
-            
-            # 添加书评
-            if reviews:
-                children.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": f"💭 我的书评 ({len(reviews)}条)"
-                                }
-                            }
-                        ]
-                    }
-                })
-                
-                for review in reviews:
-                    children.append({
-                        "object": "block",
-                        "type": "quote",
-                        "quote": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {
-                                        "content": review.content
-                                    }
-                                }
-                            ]
-                        }
-                    })
+                    chapter = item.group
+                    add(text_blocks("heading_3", chapter))
+                add(item.render(), item.item_id)
+        
+        # 添加书评
+        if reviews:
+            add(text_blocks("heading_2", f"💭 我的书评 ({len(reviews)}条)"))
             
-            # 创建页面
-            response = await self.client.pages.create(
-                parent={"database_id": self.database_id},
-                properties=properties,
-                children=children
+            for item in items:
+                if item.review is not None:
+                    add(item.render(), item.item_id)
+        
+        # 创建页面（附带第一批块）
+        batches = batch_blocks(children)
+        first_batch = batches[0] if batches else []
+        
+        response = await self._call(
+            self.client.pages.create,
+            parent={"database_id": self.database_id},
+            properties=properties,
+            children=first_batch
+        )
+        if on_created:
+            on_created(response["id"])
+        
+        # 创建页面的响应不含子块，需要时读取一次第一批块的 ID
+        created: List[Dict[str, Any]] = []
+        if any(keys[:len(first_batch)]):
+            listed = await self._call(
+                self.client.blocks.children.list,
+                block_id=response["id"],
+                page_size=len(first_batch)
+            )
+            created.extend(listed.get("results", []))
+        else:
+            created.extend({} for _ in first_batch)
+        
+        # 追加剩余的块
+        if len(children) > len(first_batch):
+            created.extend(await self.append_blocks(response["id"], children[len(first_batch):]))
+        
+        response["item_blocks"] = self._collect_item_blocks(items, keys, created)
+        if NOTES_HEADING in keys:
+            heading = created[keys.index(NOTES_HEADING)]
+            if heading.get("id"):
+                response["item_blocks"][NOTES_HEADING] = self._notes_heading_ref(heading["id"], notes_heading_text(len(notes)))
+        return response
+    
+    def _collect_item_blocks(
+        self,
+        items: List[PageItem],
+        keys: List[Optional[str]],
+        created: List[Dict[str, Any]],
+        inline: bool = False
+    ) -> Dict[str, NoteBlockRef]:
+        """根据块与条目的对应关系，整理每条笔记/书评创建出的块 ID"""
+        block_ids: Dict[str, List[str]] = {}
+        for key, block in zip(keys, created):
+            if key is not None and block.get("id"):
+                block_ids.setdefault(key, []).append(block["id"])
+        
+        return {
+            item.item_id: NoteBlockRef(
+                item_id=item.item_id,
+                block_ids=block_ids[item.item_id],
+                content_hash=item.content_hash,
+                inline=inline
             )
+            for item in items
+            if item.item_id in block_ids
+        }
+    
+    @staticmethod
+    def _notes_heading_ref(block_id: str, text: str) -> NoteBlockRef:
+        """构建"读书笔记"标题块的追踪记录"""
+        return NoteBlockRef(item_id=NOTES_HEADING, block_ids=[block_id], content_hash=text_hash(text))
+    
+    async def append_blocks(
+        self,
+        block_id: str,
+        children: List[Dict[str, Any]],
+        after: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按每批最多 100 个块顺序追加子块
+        
+        同一父块下的追加必须保持顺序，因此批次依次发送；每批单独占用一次限流额度，
+        其他书籍的请求可以在批次之间穿插执行。
+        
+        Args:
+            block_id: 父块（或页面）ID
+            children: 要追加的块
+            after: 插入到该子块之后；为 None 时追加到末尾
             
-            return response
+        Returns:
+            新创建的块列表（与 children 顺序一致）
+        """
+        created: List[Dict[str, Any]] = []
+        batches = batch_blocks(children)
+        started = time.monotonic()
+        
+        for i, batch in enumerate(batches, 1):
+            batch_started = time.monotonic()
+            append_kwargs: Dict[str, Any] = {}
+            if after:
+                # 后续批次接在上一批最后一个块之后
+                append_kwargs["after"] = created[-1]["id"] if created else after
+            
+            response = await self._call(
+                self.client.blocks.children.append,
+                block_id=block_id,
+                children=batch,
+                **append_kwargs
+            )
+            created.extend(response.get("results", []))
+            self.logger.debug(
+                f"🧱 追加块批次 [{i}/{len(batches)}]: {len(batch)} 个块, 耗时 {time.monotonic() - batch_started:.2f}s"
+            )
+        
+        if len(batches) > 1:
+            self.logger.info(
+                f"🧱 已分 {len(batches)} 批追加 {len(children)} 个块, 总耗时 {time.monotonic() - started:.2f}s"
+            )
+        return created
     
     async def find_book_page(self, book_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -261,170 +347,562 @@ class NotionClient:
             book_id: 书籍 ID
             
         Returns:
-            页面信息，如果不存在则返回 None
-        """
-        async with self.rate_limiter:
-            response = await self.client.databases.query(
-                database_id=self.database_id,
-                filter={
-                    "property": "书籍ID",
-                    "rich_text": {
-                        "equals": book_id
-                    }
+            页面信息（存在多个时取最早创建的），如果不存在则返回 None
+        """
+        pages = await self.find_book_pages(book_id)
+        return pages[0] if pages else None
+    
+    async def find_book_pages(self, book_id: str) -> List[Dict[str, Any]]:
+        """
+        查找书籍 ID 对应的全部页面
+        
+        Args:
+            book_id: 书籍 ID
+            
+        Returns:
+            按创建时间升序排列的页面列表
+        """
+        response = await self._call(
+            self.client.databases.query,
+            database_id=self.database_id,
+            filter={
+                "property": self.properties.name("book_id"),
+                "rich_text": {
+                    "equals": book_id
                 }
-            )
+            },
+            sorts=[{"timestamp": "created_time", "direction": "ascending"}]
+        )
+        
+        return response.get("results", [])
+    
+    async def archive_page(self, page_id: str):
+        """
+        归档页面（用于清理重复页面）
+        
+        Args:
+            page_id: 页面 ID
+        """
+        await self._call(self.client.pages.update, page_id=page_id, archived=True)
+        if self.page_index is not None:
+            for book_id, indexed in list(self.page_index.items()):
+                if indexed == page_id:
+                    del self.page_index[book_id]
+    
+    async def load_page_index(self, preferred: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        分页扫描数据库，构建书籍ID到页面 ID 的索引
+        
+        同一书籍ID对应多个页面时，保留 preferred 中记录的页面（否则保留最早创建的页面），
+        其余页面记入 duplicate_pages。
+        
+        Args:
+            preferred: 已确认的书籍ID → 页面 ID 映射（通常为本地持久化的索引）
+        
+        Returns:
+            书籍ID → 页面 ID 映射
+        """
+        pages: Dict[str, List[Dict[str, Any]]] = {}
+        filter_properties = await self.get_property_ids([self.properties.name("book_id")])
+        
+        async for page in self.iter_pages(filter_properties=filter_properties):
+            book_id = self._get_page_book_id(page)
+            if book_id:
+                pages.setdefault(book_id, []).append(page)
+        
+        index: Dict[str, str] = {}
+        self.duplicate_pages = {}
+        for book_id, candidates in pages.items():
+            page_ids = [page["id"] for page in sorted(candidates, key=lambda page: page.get("created_time") or "")]
+            keep = (preferred or {}).get(book_id)
+            if keep not in page_ids:
+                keep = page_ids[0]
+            index[book_id] = keep
+            duplicates = [page_id for page_id in page_ids if page_id != keep]
+            if duplicates:
+                self.duplicate_pages[book_id] = duplicates
+        
+        self.page_index = index
+        self.page_index_complete = True
+        return index
+    
+    def set_page_index(self, index: Dict[str, str]):
+        """
+        使用已持久化的索引（可能不完整，未命中时仍会查询 Notion）
+        
+        Args:
+            index: 书籍ID → 页面 ID 映射
+        """
+        self.page_index = dict(index)
+        self.page_index_complete = False
+    
+    def remember_page(self, book_id: str, page_id: str):
+        """将本次运行中创建或查到的页面加入索引"""
+        if self.page_index is None:
+            self.page_index = {}
+        self.page_index[book_id] = page_id
+    
+    async def resolve_page_id(self, book_id: str) -> Optional[str]:
+        """
+        根据书籍 ID 获取页面 ID，优先使用内存索引
+        
+        Args:
+            book_id: 书籍 ID
+            
+        Returns:
+            页面 ID，如果不存在则返回 None
+        """
+        if self.page_index is not None:
+            if book_id in self.page_index:
+                return self.page_index[book_id]
+            if self.page_index_complete:
+                return None
+        
+        page = await self.find_book_page(book_id)
+        if page is None:
+            return None
+        self.remember_page(book_id, page["id"])
+        return page["id"]
+    
+    def _get_page_book_id(self, page: Dict[str, Any]) -> Optional[str]:
+        """从页面属性中读取书籍ID"""
+        return self._get_plain_text(page, self.properties.name("book_id"))
+    
+    @staticmethod
+    def _get_plain_text(page: Dict[str, Any], name: str) -> Optional[str]:
+        """读取页面文本属性的纯文本"""
+        rich_text = page.get("properties", {}).get(name, {}).get("rich_text", [])
+        text = "".join(item.get("plain_text") or item.get("text", {}).get("content", "") for item in rich_text)
+        return text or None
+    
+    def progress_properties(self, book_info: BookInfo) -> Dict[str, Any]:
+        """
+        构建阅读状态相关的页面属性（更新页面时会写入的部分）
+        
+        Args:
+            book_info: 书籍信息
             
-            results = response.get("results", [])
-            return results[0] if results else None
+        Returns:
+            属性名 → 属性值
+        """
+        return self.properties.build(book_info, PROGRESS_FIELDS)
     
-    async def update_book_page(self, page_id: str, book_info: BookInfo, notes: List[ReadingNote] = None, reviews: List[BookReview] = None) -> Dict[str, Any]:
+    async def update_book_page(
+        self,
+        page_id: str,
+        book_info: BookInfo,
+        notes: List[ReadingNote] = None,
+        reviews: List[BookReview] = None,
+        previous_properties: Optional[Dict[str, Any]] = None,
+        retrieve: bool = False
+    ) -> Dict[str, Any]:
         """
         更新书籍页面
         
         Args:
             page_id: 页面 ID
             book_info: 书籍信息
-            notes: 读书笔记列表
-            reviews: 书评列表
+            notes: 要追加的读书笔记列表
+            reviews: 要追加的书评列表
+            previous_properties: 上次写入的属性值；提供时只写入发生变化的属性
+            retrieve: 是否在更新后重新获取完整的页面信息
             
         Returns:
-            更新后的页面信息
+            retrieve 为 True 时返回更新后的页面信息，否则只包含页面 ID
         """
-        async with self.rate_limiter:
-            # 更新页面属性
+        properties = self.progress_properties(book_info)
+        
+        # 只写入与上次不同的属性
+        if previous_properties is not None:
             properties = {
-                "阅读进度": {
-                    "number": book_info.read_progress
-                } if book_info.read_progress is not None else None,
-                "完成阅读": {
-                    "checkbox": book_info.finish_reading == 1
-                } if book_info.finish_reading is not None else None,
-                "最后阅读时间": {
-                    "date": {
-                        "start": book_info.last_read_time.isoformat()
-                    }
-                } if book_info.last_read_time else None
+                k: v for k, v in properties.items()
+                if previous_properties.get(k) != v
             }
+        
+        # 更新页面属性
+        if properties:
+            await self._call(
+                self.client.pages.update,
+                page_id=page_id,
+                properties=properties
+            )
+        
+        # 如果有新的笔记或书评，追加到页面内容
+        if notes or reviews:
+            await self._append_update_section(page_id, build_page_items(notes, reviews))
+        
+        if not retrieve:
+            return {"object": "page", "id": page_id}
+        
+        # 返回更新后的页面信息
+        return await self._call(self.client.pages.retrieve, page_id=page_id)
+    
+    async def _append_update_section(self, page_id: str, items: List[PageItem]) -> Dict[str, NoteBlockRef]:
+        """
+        在页面末尾追加"更新"分区（分隔线、更新时间、新增笔记与书评）
+        
+        Args:
+            page_id: 页面 ID
+            items: 要追加的条目
             
-            # 过滤掉 None 值
-            properties = {k: v for k, v in properties.items() if v is not None}
+        Returns:
+            条目 ID 到所创建块的对应关系
+        """
+        children = []
+        keys: List[Optional[str]] = []
+        
+        def add(blocks: List[Dict[str, Any]], key: Optional[str] = None):
+            children.extend(blocks)
+            keys.extend([key] * len(blocks))
+        
+        # 添加分隔线
+        add([divider_block()])
+        
+        # 添加更新时间
+        add(text_blocks(
+            "paragraph",
+            f"🔄 更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            annotations={"color": "gray"}
+        ))
+        
+        # 添加新笔记（脱离章节标题，内容前附带章节名）
+        note_items = [item for item in items if item.note is not None]
+        if note_items:
+            add(text_blocks("heading_3", f"📝 新增笔记 ({len(note_items)}条)"))
             
-            # 更新页面属性
-            if properties:
-                await self.client.pages.update(
-                    page_id=page_id,
-                    properties=properties
+            for item in note_items:
+                add(item.render(inline=True), item.item_id)
+        
+        # 添加新书评
+        review_items = [item for item in items if item.review is not None]
+        if review_items:
+            add(text_blocks("heading_3", f"💭 新增书评 ({len(review_items)}条)"))
+            
+            for item in review_items:
+                add(item.render(inline=True), item.item_id)
+        
+        # 追加内容到页面
+        created = await self.append_blocks(page_id, children)
+        return self._collect_item_blocks(items, keys, created, inline=True)
+    
+    async def match_page_items(self, page_id: str, items: List[PageItem]) -> Dict[str, NoteBlockRef]:
+        """
+        扫描一次页面的全部块，按内容找出已写入页面的条目（用于没有本地追踪记录的页面）
+        
+        每个条目依次尝试按章节分组渲染与追加分区（内容前附带章节名）两种形式，
+        匹配到连续且类型、文本一致的块时记录其块 ID；同一块只会匹配给一个条目。
+        同时记录"读书笔记"标题块，供对账后更新笔记数。
+        
+        Args:
+            page_id: 页面 ID
+            items: 当前的页面条目
+            
+        Returns:
+            匹配到的条目 ID → 块对应关系（未匹配的条目不包含在内）
+        """
+        blocks = [block async for block in self._iter_child_blocks(page_id)]
+        signatures = [self._block_signature(block) for block in blocks]
+        positions: Dict[Tuple[str, str], List[int]] = {}
+        for position, signature in enumerate(signatures):
+            positions.setdefault(signature, []).append(position)
+        
+        claimed = set()
+        refs: Dict[str, NoteBlockRef] = {}
+        for item in items:
+            for inline in (False, True):
+                expected = [self._block_signature(block) for block in item.render(inline)]
+                for start in positions.get(expected[0], []):
+                    span = range(start, start + len(expected))
+                    if signatures[start:start + len(expected)] == expected and not claimed.intersection(span):
+                        claimed.update(span)
+                        refs[item.item_id] = NoteBlockRef(
+                            item_id=item.item_id,
+                            block_ids=[blocks[i]["id"] for i in span],
+                            content_hash=item.content_hash,
+                            inline=inline
+                        )
+                        break
+                if item.item_id in refs:
+                    break
+        
+        # "读书笔记"标题块，用于对账后更新笔记数
+        for block, (block_type, text) in zip(blocks, signatures):
+            if block_type == "heading_2" and text.startswith("📝 读书笔记 ("):
+                refs[NOTES_HEADING] = self._notes_heading_ref(block["id"], text)
+                break
+        return refs
+    
+    @staticmethod
+    def _block_signature(block: Dict[str, Any]) -> Tuple[str, str]:
+        """块的类型与纯文本（用于按内容匹配块）"""
+        block_type = block.get("type", "")
+        rich_text = block.get(block_type, {}).get("rich_text", []) if isinstance(block.get(block_type), dict) else []
+        text = "".join(item.get("plain_text") or item.get("text", {}).get("content", "") for item in rich_text)
+        return block_type, text
+    
+    async def reconcile_book_page(
+        self,
+        page_id: str,
+        notes: List[ReadingNote],
+        reviews: List[BookReview],
+        known: Dict[str, NoteBlockRef],
+        note_count: Optional[int] = None
+    ) -> Dict[str, NoteBlockRef]:
+        """
+        按块对账：只删除、更新、插入发生变化的笔记和书评
+        
+        Args:
+            page_id: 页面 ID
+            notes: 当前全部笔记
+            reviews: 当前全部书评
+            known: 已写入页面的条目 → 块的对应关系
+            note_count: 页面中的笔记数；提供且与"读书笔记"标题不一致时更新标题
+            
+        Returns:
+            对账后的条目 ID → 块对应关系
+        """
+        plan = plan_reconciliation(build_page_items(notes, reviews), known)
+        refs = dict(plan.kept)
+        
+        heading = known.get(NOTES_HEADING)
+        if heading is not None:
+            refs[NOTES_HEADING] = heading
+            if note_count is not None and heading.block_ids:
+                refs[NOTES_HEADING] = await self._update_notes_heading(heading, note_count)
+        
+        if plan.is_empty:
+            return refs
+        
+        # 删除已移除或需要重建的块
+        for block_id in plan.deletes:
+            await self._call(self.client.blocks.delete, block_id=block_id)
+        
+        # 原地更新被编辑的条目
+        for item, ref in plan.updates:
+            for block_id, block in zip(ref.block_ids, item.render(ref.inline)):
+                block_type = block["type"]
+                await self._call(
+                    self.client.blocks.update,
+                    block_id=block_id,
+                    **{block_type: {"rich_text": block[block_type]["rich_text"]}}
                 )
+            refs[item.item_id] = NoteBlockRef(
+                item_id=item.item_id,
+                block_ids=ref.block_ids,
+                content_hash=item.content_hash,
+                inline=ref.inline
+            )
+        
+        # 新条目插入到同章节前一条笔记之后，渲染形式与锚点所在的分区一致
+        for run in plan.inserts:
+            children = []
+            keys: List[Optional[str]] = []
+            for item in run.items:
+                blocks = item.render(run.inline)
+                children.extend(blocks)
+                keys.extend([item.item_id] * len(blocks))
+            created = await self.append_blocks(page_id, children, after=run.anchor)
+            refs.update(self._collect_item_blocks(run.items, keys, created, inline=run.inline))
+        
+        # 没有锚点的条目追加到页面末尾
+        if plan.tail:
+            refs.update(await self._append_update_section(page_id, plan.tail))
+        
+        inserted = sum(len(run.items) for run in plan.inserts) + len(plan.tail)
+        self.logger.info(
+            f"🔁 页面对账: 删除 {len(plan.deletes)} 块, 更新 {len(plan.updates)} 条, 插入 {inserted} 条"
+        )
+        return refs
+    
+    async def _update_notes_heading(self, heading: NoteBlockRef, note_count: int) -> NoteBlockRef:
+        """
+        笔记数变化时更新"读书笔记"标题
+        
+        Args:
+            heading: 标题块的追踪记录
+            note_count: 页面中的笔记数
             
-            # 如果有新的笔记或书评，追加到页面内容
-            if notes or reviews:
-                children = []
-                
-                # 添加分隔线
-                children.append({
-                    "object": "block",
-                    "type": "divider",
-                    "divider": {}
-                })
-                
-                # 添加更新时间
-                children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {
-                                    "content": f"🔄 更新时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                                },
-                                "annotations": {
-                                    "color": "gray"
-                                }
-                            }
-                        ]
-                    }
-                })
-                
-                # 添加新笔记
-                if notes:
-                    children.append({
-                        "object": "block",
-                        "type": "heading_3",
-                        "heading_3": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {
-                                        "content": f"📝 新增笔记 ({len(notes)}条)"
-                                    }
-                                }
-                            ]
-                        }
-                    })
-                    
-                    for note in notes:
-                        note_type_emoji = "📝" if note.note_type == "review" else "📖"
-                        children.append({
-                            "object": "block",
-                            "type": "callout",
-                            "callout": {
-                                "icon": {
-                                    "type": "emoji",
-                                    "emoji": note_type_emoji
-                                },
-                                "rich_text": [
-                                    {
-                                        "type": "text",
-                                        "text": {
-                                            "content": f"[{note.chapter_title}] {note.content}"
-                                        }
-                                    }
-                                ]
-                            }
-                        })
-                
-                # 添加新书评
-                if reviews:
-                    children.append({
-                        "object": "block",
-                        "type": "heading_3",
-                        "heading_3": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {
-                                        "content": f"💭 新增书评 ({len(reviews)}条)"
-                                    }
-                                }
-                            ]
-                        }
-                    })
-                    
-                    for review in reviews:
-                        children.append({
-                            "object": "block",
-                            "type": "quote",
-                            "quote": {
-                                "rich_text": [
-                                    {
-                                        "type": "text",
-                                        "text": {
-                                            "content": review.content
-                                        }
-                                    }
-                                ]
-                            }
-                        })
-                
-                # 追加内容到页面
-                await self.client.blocks.children.append(
-                    block_id=page_id,
-                    children=children
+        Returns:
+            更新后的追踪记录
+        """
+        text = notes_heading_text(note_count)
+        if heading.content_hash == text_hash(text):
+            return heading
+        
+        block = text_blocks("heading_2", text)[0]
+        await self._call(
+            self.client.blocks.update,
+            block_id=heading.block_ids[0],
+            heading_2={"rich_text": block["heading_2"]["rich_text"]}
+        )
+        return self._notes_heading_ref(heading.block_ids[0], text)
+    
+    async def iter_pages(
+        self,
+        filter: Optional[Dict[str, Any]] = None,
+        filter_properties: Optional[List[str]] = None,
+        page_size: int = 100,
+        database_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        按游标分页流式遍历数据库中的页面
+        
+        首个请求因 filter_properties 被拒绝（400）时，退回为返回全部属性的扫描。
+        
+        Args:
+            filter: 查询过滤条件
+            filter_properties: 只返回这些属性（未编码的属性 ID），为 None 时返回全部属性
+            page_size: 每次请求的页面数量（最大 100）
+            database_id: 要遍历的数据库，默认为书籍数据库
+            
+        Yields:
+            页面信息
+        """
+        start_cursor = None
+        
+        while True:
+            query_kwargs: Dict[str, Any] = {"page_size": page_size}
+            if filter:
+                query_kwargs["filter"] = filter
+            if filter_properties:
+                query_kwargs["filter_properties"] = filter_properties
+            if start_cursor:
+                query_kwargs["start_cursor"] = start_cursor
+            
+            try:
+                response = await self._call(
+                    self.client.databases.query,
+                    database_id=database_id or self.database_id,
+                    **query_kwargs
+                )
+            except APIResponseError as e:
+                if not filter_properties or start_cursor or e.code not in (
+                    APIErrorCode.ValidationError, APIErrorCode.InvalidRequest
+                ):
+                    raise
+                self.logger.warning(f"⚠️  按属性过滤的查询被拒绝，改为返回全部属性: {str(e)}")
+                filter_properties = None
+                continue
+            
+            for page in response.get("results", []):
+                yield page
+            
+            if not response.get("has_more") or not response.get("next_cursor"):
+                break
+            start_cursor = response["next_cursor"]
+    
+    async def load_highlight_index(self) -> Dict[str, str]:
+        """
+        校验划线数据库结构，并分页扫描一次构建划线ID到页面 ID 的索引
+        
+        Returns:
+            划线ID → 页面 ID 映射
+            
+        Raises:
+            SchemaError: 划线数据库结构不匹配
+        """
+        database = await self._call(self.client.databases.retrieve, database_id=self.highlights_database_id)
+        schema = schema_from_database(database)
+        check_highlight_schema(schema)
+        
+        index: Dict[str, str] = {}
+        async for page in self.iter_pages(
+            filter_properties=[unquote(schema.properties["划线ID"]["id"])],
+            database_id=self.highlights_database_id
+        ):
+            highlight_id = self._get_plain_text(page, "划线ID")
+            if highlight_id and highlight_id not in index:
+                index[highlight_id] = page["id"]
+        
+        self.highlight_index = index
+        return index
+    
+    def highlight_properties(self, note: ReadingNote, highlight_id: str, book_page_id: str) -> Dict[str, Any]:
+        """
+        构建划线数据库中一行的属性
+        
+        Args:
+            note: 划线
+            highlight_id: 划线ID
+            book_page_id: 书籍页面 ID（用于关联）
+            
+        Returns:
+            属性名 → 属性值
+        """
+        properties = {
+            "划线ID": {"rich_text": rich_text(highlight_id)},
+            "划线内容": {"title": rich_text(note.content)},
+            "书籍": {"relation": [{"id": book_page_id}]},
+        }
+        if note.chapter_title:
+            properties["章节"] = {"rich_text": rich_text(note.chapter_title[:100])}
+        if note.create_time and note.create_time.timestamp() > 0:
+            properties["创建时间"] = {"date": {"start": note.create_time.strftime("%Y-%m-%d")}}
+        return properties
+    
+    async def upsert_highlights(
+        self,
+        rows: List[Tuple[str, Dict[str, Any]]],
+        concurrency: int = 2
+    ) -> List[Any]:
+        """
+        并发写入划线数据库（已存在的行更新属性，其余新建）
+        
+        所有请求共用同一个限流器，并发数只决定同时等待令牌的请求数。
+        
+        Args:
+            rows: (划线ID, 属性) 列表
+            concurrency: 最大并发请求数
+            
+        Returns:
+            与 rows 一一对应的结果：成功时为页面 ID，失败时为异常
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def upsert(highlight_id: str, properties: Dict[str, Any]) -> str:
+            async with semaphore:
+                page_id = self.highlight_index.get(highlight_id)
+                if page_id:
+                    await self._call(self.client.pages.update, page_id=page_id, properties=properties)
+                    return page_id
+                page = await self._call(
+                    self.client.pages.create,
+                    parent={"database_id": self.highlights_database_id},
+                    properties=properties
                 )
+                self.highlight_index[highlight_id] = page["id"]
+                return page["id"]
+        
+        return await asyncio.gather(
+            *(upsert(highlight_id, properties) for highlight_id, properties in rows),
+            return_exceptions=True
+        )
+    
+    async def get_property_ids(self, names: List[str]) -> Optional[List[str]]:
+        """
+        获取属性名对应的属性 ID（结果会缓存）
+        
+        数据库结构中的属性 ID 是 URL 编码过的（如 "%5BmaA"），请求时会被再次编码，
+        因此这里返回解码后的 ID。
+        
+        Args:
+            names: 属性名列表
             
-            # 返回更新后的页面信息
-            return await self.client.pages.retrieve(page_id=page_id)
+        Returns:
+            解码后的属性 ID 列表；数据库结构获取失败或属性不存在时返回 None
+        """
+        if self._property_ids is None:
+            try:
+                database = await self._call(self.client.databases.retrieve, database_id=self.database_id)
+            except Exception:
+                return None
+            self._property_ids = {
+                name: prop["id"] for name, prop in database.get("properties", {}).items()
+            }
+        
+        if not all(name in self._property_ids for name in names):
+            return None
+        return [unquote(self._property_ids[name]) for name in names]
     
     async def list_all_books(self) -> List[Dict[str, Any]]:
         """
@@ -433,73 +911,158 @@ class NotionClient:
         Returns:
             书籍页面列表
         """
-        async with self.rate_limiter:
-            response = await self.client.databases.query(
-                database_id=self.database_id
-            )
-            return response.get("results", [])
+        return [page async for page in self.iter_pages()]
     
-    async def create_database_if_not_exists(self, parent_page_id: str) -> str:
+    async def count_books(self) -> int:
         """
-        创建书籍数据库（如果不存在）
+        统计数据库中的书籍页面数量（流式计数，只传输标题属性）
+        
+        Returns:
+            页面数量
+        """
+        count = 0
+        # 标题属性的 ID 固定为 "title"
+        async for _ in self.iter_pages(filter_properties=["title"]):
+            count += 1
+        return count
+    
+    async def create_database_if_not_exists(self, parent_page_id: str, database_id: Optional[str] = None) -> str:
+        """
+        查找或创建书籍数据库
+        
+        依次尝试：已知的数据库 ID（通常来自本地缓存）→ 父页面下结构匹配的子数据库 → 新建数据库。
+        结果写入 database_id 与 database_schema。
         
         Args:
             parent_page_id: 父页面 ID
+            database_id: 已知的数据库 ID
             
         Returns:
             数据库 ID
         """
-        async with self.rate_limiter:
-            database = await self.client.databases.create(
-                parent={"page_id": parent_page_id},
-                title=[
-                    {
-                        "type": "text",
-                        "text": {
-                            "content": "📚 我的书架"
-                        }
-                    }
-                ],
-                properties={
-                    "书名": {
-                        "title": {}
-                    },
-                    "作者": {
-                        "rich_text": {}
-                    },
-                    "书籍ID": {
-                        "rich_text": {}
-                    },
-                    "分类": {
-                        "select": {
-                            "options": [
-                                {"name": "小说", "color": "blue"},
-                                {"name": "非虚构", "color": "green"},
-                                {"name": "技术", "color": "orange"},
-                                {"name": "历史", "color": "purple"},
-                                {"name": "哲学", "color": "red"},
-                                {"name": "科学", "color": "yellow"},
-                                {"name": "传记", "color": "pink"},
-                                {"name": "其他", "color": "gray"}
-                            ]
-                        }
-                    },
-                    "阅读进度": {
-                        "number": {
-                            "format": "percent"
-                        }
-                    },
-                    "评分": {
-                        "number": {
-                            "format": "number"
-                        }
-                    },
-                    "完成阅读": {
-                        "checkbox": {}
-                    },
-                    "最后阅读时间": {
-                        "date": {}
+        if database_id:
+            database = await self._retrieve_database(database_id)
+            if database and self._is_book_database(database):
+                return self._use_database(database)
+            self.logger.warning(f"⚠️  缓存的数据库 {database_id} 不存在或结构不匹配，重新查找")
+        
+        async for block in self._iter_child_blocks(parent_page_id):
+            if block.get("type") != "child_database" or block["id"] == database_id:
+                continue
+            database = await self._retrieve_database(block["id"])
+            if database and self._is_book_database(database):
+                self.logger.info(f"🗄️  使用父页面下已有的书籍数据库: {database['id']}")
+                return self._use_database(database)
+        
+        database = await self._call(
+            self.client.databases.create,
+            parent={"page_id": parent_page_id},
+            title=[
+                {
+                    "type": "text",
+                    "text": {
+                        "content": BOOK_DATABASE_TITLE
                     }
                 }
-            )
-            return database["id"]
\ No newline at end of file
+            ],
+            properties=self._database_properties()
+        )
+        self.logger.info(f"🗄️  已创建书籍数据库: {database['id']}")
+        return self._use_database(database)
+    
+    async def _retrieve_database(self, database_id: str) -> Optional[Dict[str, Any]]:
+        """读取数据库结构，数据库不存在或无权访问时返回 None"""
+        try:
+            return await self._call(self.client.databases.retrieve, database_id=database_id)
+        except APIResponseError as e:
+            if e.code in (APIErrorCode.ObjectNotFound, APIErrorCode.Unauthorized, APIErrorCode.RestrictedResource):
+                return None
+            raise
+    
+    async def _iter_child_blocks(self, block_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """按游标分页遍历块的子块"""
+        start_cursor = None
+        while True:
+            kwargs: Dict[str, Any] = {"block_id": block_id, "page_size": 100}
+            if start_cursor:
+                kwargs["start_cursor"] = start_cursor
+            response = await self._call(self.client.blocks.children.list, **kwargs)
+            
+            for block in response.get("results", []):
+                yield block
+            
+            if not response.get("has_more") or not response.get("next_cursor"):
+                break
+            start_cursor = response["next_cursor"]
+    
+    def _is_book_database(self, database: Dict[str, Any]) -> bool:
+        """判断数据库未被删除，且其结构满足属性映射（必需属性存在，已有属性类型一致）"""
+        if database.get("archived") or database.get("in_trash"):
+            return False
+        try:
+            resolve_properties(schema_from_database(database), self.property_names)
+        except SchemaError:
+            return False
+        return True
+    
+    def _database_properties(self) -> Dict[str, Dict[str, Any]]:
+        """按属性映射构建新建数据库的属性（使用自定义属性名，不写入的可选字段不创建）"""
+        names = resolve_properties(None, self.property_names).names
+        return {
+            names[field]: BOOK_DATABASE_PROPERTIES[default_name]
+            for field, (default_name, _, _) in BOOK_FIELDS.items()
+            if field in names
+        }
+    
+    def _use_database(self, database: Dict[str, Any]) -> str:
+        """切换到指定数据库，并记录其结构"""
+        self.database_id = database["id"]
+        self.set_schema(schema_from_database(database))
+        return self.database_id
+    
+    async def load_schema(self, cached: Optional[DatabaseSchema] = None) -> DatabaseSchema:
+        """
+        读取数据库结构并校验属性映射（一次请求）
+        
+        Args:
+            cached: 本地缓存的结构；读取因网络等原因失败时使用
+            
+        Returns:
+            数据库结构
+            
+        Raises:
+            SchemaError: 数据库结构与属性映射不匹配
+        """
+        try:
+            database = await self._call(self.client.databases.retrieve, database_id=self.database_id)
+            schema = schema_from_database(database)
+        except APIResponseError:
+            raise
+        except Exception as e:
+            if cached is None:
+                raise
+            self.logger.warning(f"⚠️  读取数据库结构失败，使用本地缓存: {str(e)}")
+            schema = cached
+        
+        self.set_schema(schema)
+        return schema
+    
+    def set_schema(self, schema: DatabaseSchema):
+        """
+        使用指定的数据库结构，并按其校验、编译属性映射
+        
+        结构版本（数据库最后编辑时间）与当前使用的一致时，沿用已解析的属性映射。
+        
+        Raises:
+            SchemaError: 数据库结构与属性映射不匹配
+        """
+        if (
+            self.schema is not None and schema.version
+            and (self.schema.database_id, self.schema.version) == (schema.database_id, schema.version)
+        ):
+            return
+        self.properties = resolve_properties(schema, self.property_names)
+        self.schema = schema
+        self._property_ids = {name: prop["id"] for name, prop in schema.properties.items()}
+        if self.properties.skipped:
+            self.logger.info(f"ℹ️  数据库中没有以下可选属性，将不会写入: {', '.join(self.properties.skipped)}")
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+
+class NotionRateLimiter:
+    """
+    Notion API 令牌桶限流器
+
+    每次 API 调用获取一个令牌；收到 429 时通过 pause 全局暂停，
+    暂停期间所有调用方都会等待。同时统计请求数、等待时间与利用率。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        初始化限流器
+
+        Args:
+            rate: 每秒补充的令牌数（即每秒请求数）
+            capacity: 令牌桶容量（允许的突发请求数），默认与 rate 相同
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+        # 统计信息
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """等待并获取一个令牌（按到达顺序排队）"""
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        self.requests += 1
+        self.wait_time += time.monotonic() - start
+
+    def pause(self, seconds: float):
+        """
+        全局暂停（收到 429 时调用）
+
+        Args:
+            seconds: 暂停时长（秒），通常来自 Retry-After
+        """
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._refill(now)
+        self._tokens = 0
+        self.throttled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+
+        Returns:
+            请求数、限流次数、总等待/平均等待时间（秒）、利用率（实际请求数 / 预算请求数）
+        """
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'wait_time': self.wait_time,
+            'avg_wait': self.wait_time / self.requests if self.requests else 0.0,
+            'utilization': min(1.0, self.requests / (elapsed * self.rate))
+        }
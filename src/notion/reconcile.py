@@ -0,0 +1,154 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models import ReadingNote, BookReview, NoteBlockRef
+from .blocks import note_blocks, review_blocks
+
+
+# 书评在页面中单独成组
+REVIEW_GROUP = "__reviews__"
+
+# "读书笔记"标题块在追踪记录中的条目 ID（标题中的笔记数随对账更新）
+NOTES_HEADING = "__notes_heading__"
+
+
+def text_hash(text: str) -> str:
+    """文本哈希，用于判断块内容是否变化"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def notes_heading_text(count: int) -> str:
+    """页面中"读书笔记"标题的文本"""
+    return f"📝 读书笔记 ({count}条)"
+
+
+@dataclass
+class PageItem:
+    """页面中的一条笔记或书评"""
+    item_id: str
+    group: str
+    content: str
+    note: Optional[ReadingNote] = None
+    review: Optional[BookReview] = None
+
+    @property
+    def content_hash(self) -> str:
+        """内容哈希，用于判断笔记是否被编辑"""
+        return text_hash(self.content)
+
+    def render(self, inline: bool = False) -> List[Dict[str, Any]]:
+        """渲染为 Notion 块"""
+        if self.note is not None:
+            return note_blocks(self.note, inline)
+        return review_blocks(self.review)
+
+
+@dataclass
+class InsertRun:
+    """插入到同一锚点块之后的一组连续条目"""
+    anchor: str
+    items: List[PageItem] = field(default_factory=list)
+    # 锚点位于"更新"分区时，新条目同样按内容前附带章节名的形式渲染
+    inline: bool = False
+
+
+@dataclass
+class ReconcilePlan:
+    """页面与当前笔记之间的最小差异"""
+    deletes: List[str] = field(default_factory=list)
+    updates: List[Tuple[PageItem, NoteBlockRef]] = field(default_factory=list)
+    inserts: List[InsertRun] = field(default_factory=list)
+    tail: List[PageItem] = field(default_factory=list)
+    kept: Dict[str, NoteBlockRef] = field(default_factory=dict)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.deletes or self.updates or self.inserts or self.tail)
+
+
+def build_page_items(notes: List[ReadingNote], reviews: List[BookReview]) -> List[PageItem]:
+    """
+    按页面中的渲染顺序构建条目列表（笔记按章节分组，书评在最后）
+
+    Args:
+        notes: 读书笔记列表
+        reviews: 书评列表
+
+    Returns:
+        页面条目列表
+    """
+    notes_by_chapter: Dict[str, List[ReadingNote]] = {}
+    for note in notes or []:
+        notes_by_chapter.setdefault(note.chapter_title or "其他", []).append(note)
+
+    items = []
+    for chapter, chapter_notes in notes_by_chapter.items():
+        for note in chapter_notes:
+            items.append(PageItem(item_id=note.note_id, group=chapter, content=note.content, note=note))
+    for review in reviews or []:
+        items.append(PageItem(item_id=review.review_id, group=REVIEW_GROUP, content=review.content, review=review))
+    return items
+
+
+def plan_reconciliation(items: List[PageItem], known: Dict[str, NoteBlockRef]) -> ReconcilePlan:
+    """
+    计算页面需要的块删除、更新与插入
+
+    新条目会插入到同组中前一条已知条目的块之后，并沿用该条目的渲染形式；
+    同组内没有可用锚点时放入 tail，由调用方追加到页面末尾。
+    没有块 ID 的历史记录无法定位，保持原样。
+
+    Args:
+        items: 当前的页面条目（按渲染顺序）
+        known: 已写入页面的条目 → 块的对应关系
+
+    Returns:
+        对账计划
+    """
+    plan = ReconcilePlan()
+    current_ids = {item.item_id for item in items}
+
+    # 已从微信读书删除的条目（标题块由调用方单独维护）
+    for item_id, ref in known.items():
+        if item_id not in current_ids and item_id != NOTES_HEADING:
+            plan.deletes.extend(ref.block_ids)
+
+    last_anchor: Dict[str, NoteBlockRef] = {}
+    open_run: Dict[str, InsertRun] = {}
+
+    for item in items:
+        ref = known.get(item.item_id)
+
+        if ref is not None and not ref.block_ids:
+            # 历史记录，没有块 ID，既不能更新也不能作为锚点
+            plan.kept[item.item_id] = ref
+            continue
+
+        if ref is not None:
+            if ref.content_hash == item.content_hash:
+                plan.kept[item.item_id] = ref
+                last_anchor[item.group] = ref
+                open_run.pop(item.group, None)
+                continue
+            if len(item.render(ref.inline)) == len(ref.block_ids):
+                # 编辑后块数不变，原地更新
+                plan.updates.append((item, ref))
+                last_anchor[item.group] = ref
+                open_run.pop(item.group, None)
+                continue
+            # 块数变化，删除后在原位置重新插入
+            plan.deletes.extend(ref.block_ids)
+
+        run = open_run.get(item.group)
+        if run is not None:
+            run.items.append(item)
+        elif item.group in last_anchor:
+            anchor = last_anchor[item.group]
+            run = InsertRun(anchor=anchor.block_ids[-1], items=[item], inline=anchor.inline)
+            plan.inserts.append(run)
+            open_run[item.group] = run
+        else:
+            plan.tail.append(item)
+
+    return plan
@@ -0,0 +1,177 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..models import BookInfo, DatabaseSchema
+from .blocks import rich_text
+
+
+class SchemaError(Exception):
+    """数据库结构与属性映射不匹配"""
+
+
+# 书籍字段 → (默认属性名, 属性类型, 是否必需)
+BOOK_FIELDS: Dict[str, Tuple[str, str, bool]] = {
+    "title": ("书名", "title", True),
+    "author": ("作者", "rich_text", False),
+    "book_id": ("书籍ID", "rich_text", True),
+    "category": ("分类", "select", False),
+    "read_progress": ("阅读进度", "number", False),
+    "rating": ("评分", "number", False),
+    "finish_reading": ("完成阅读", "checkbox", False),
+    "last_read_time": ("最后阅读时间", "date", False),
+}
+
+# 更新页面时写入的字段（阅读状态）
+PROGRESS_FIELDS = ("read_progress", "finish_reading", "last_read_time")
+
+# 划线数据库的属性 → 属性类型（全部必需）
+HIGHLIGHT_PROPERTIES: Dict[str, str] = {
+    "划线ID": "rich_text",
+    "划线内容": "title",
+    "书籍": "relation",
+    "章节": "rich_text",
+    "创建时间": "date",
+}
+
+# 字段 → 属性值构建函数；返回 None 表示不写入该属性
+PROPERTY_BUILDERS: Dict[str, Callable[[BookInfo], Optional[Dict[str, Any]]]] = {
+    "title": lambda book: {"title": rich_text(book.title)},
+    "author": lambda book: {"rich_text": rich_text(book.author or "")},
+    "book_id": lambda book: {"rich_text": rich_text(book.book_id)},
+    "category": lambda book: {"select": {"name": book.category}} if book.category else None,
+    "read_progress": lambda book: {"number": book.read_progress} if book.read_progress is not None else None,
+    "rating": lambda book: {"number": book.rating} if book.rating is not None else None,
+    "finish_reading": lambda book: {"checkbox": book.finish_reading == 1} if book.finish_reading is not None else None,
+    "last_read_time": lambda book: {"date": {"start": book.last_read_time.isoformat()}} if book.last_read_time else None,
+}
+
+
+def schema_from_database(database: Dict[str, Any]) -> DatabaseSchema:
+    """
+    从 databases.retrieve / databases.create 的响应中提取数据库结构
+
+    Args:
+        database: 数据库对象
+
+    Returns:
+        数据库结构
+    """
+    return DatabaseSchema(
+        database_id=database["id"],
+        version=database.get("last_edited_time"),
+        properties={
+            name: {"id": prop["id"], "type": prop["type"]}
+            for name, prop in database.get("properties", {}).items()
+        }
+    )
+
+
+class PropertyMap:
+    """书籍字段到数据库属性的映射，并预先编译各属性的构建函数"""
+
+    def __init__(self, names: Dict[str, str], ids: Optional[Dict[str, str]] = None, skipped: Optional[List[str]] = None):
+        """
+        Args:
+            names: 字段 → 属性名
+            ids: 字段 → 属性 ID（来自数据库结构）
+            skipped: 数据库中不存在而被跳过的可选字段
+        """
+        self.names = names
+        self.ids = ids or {}
+        self.skipped = skipped or []
+        self._compiled = {
+            field: (name, PROPERTY_BUILDERS[field]) for field, name in names.items()
+        }
+
+    def name(self, field: str) -> str:
+        """获取字段对应的属性名"""
+        return self.names[field]
+
+    def build(self, book_info: BookInfo, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        构建页面属性
+
+        Args:
+            book_info: 书籍信息
+            fields: 只构建这些字段，默认构建全部已映射的字段
+
+        Returns:
+            属性名 → 属性值（不含空值）
+        """
+        compiled = self._compiled.values() if fields is None else (
+            self._compiled[field] for field in fields if field in self._compiled
+        )
+        properties = {}
+        for name, builder in compiled:
+            value = builder(book_info)
+            if value is not None:
+                properties[name] = value
+        return properties
+
+
+def resolve_properties(schema: Optional[DatabaseSchema], overrides: Optional[Dict[str, str]] = None) -> PropertyMap:
+    """
+    校验并解析属性映射
+
+    Args:
+        schema: 数据库结构；为 None 时只按配置生成映射，不做校验
+        overrides: 字段 → 自定义属性名；属性名为空表示不写入该可选字段
+
+    Returns:
+        属性映射
+
+    Raises:
+        SchemaError: 配置了未知字段、缺少必需属性或属性类型不匹配（一次列出全部问题）
+    """
+    overrides = overrides or {}
+    errors = [f"未知字段 {field}" for field in overrides if field not in BOOK_FIELDS]
+    names: Dict[str, str] = {}
+    ids: Dict[str, str] = {}
+    skipped: List[str] = []
+
+    for field, (default_name, prop_type, required) in BOOK_FIELDS.items():
+        name = overrides.get(field, default_name)
+        if not name:
+            if required:
+                errors.append(f"必需字段 {field} 未配置属性名")
+            continue
+        if schema is None:
+            names[field] = name
+            continue
+
+        prop = schema.properties.get(name)
+        if prop is None:
+            if required:
+                errors.append(f"缺少属性「{name}」({prop_type})")
+            else:
+                skipped.append(name)
+            continue
+        if prop["type"] != prop_type:
+            errors.append(f"属性「{name}」的类型为 {prop['type']}，应为 {prop_type}")
+            continue
+        names[field] = name
+        ids[field] = prop["id"]
+
+    if errors:
+        raise SchemaError("Notion 数据库结构与属性映射不匹配: " + "; ".join(errors))
+    return PropertyMap(names, ids, skipped)
+
+
+def check_highlight_schema(schema: DatabaseSchema):
+    """
+    校验划线数据库的结构
+
+    Args:
+        schema: 划线数据库结构
+
+    Raises:
+        SchemaError: 缺少属性或属性类型不匹配（一次列出全部问题）
+    """
+    errors = []
+    for name, prop_type in HIGHLIGHT_PROPERTIES.items():
+        prop = schema.properties.get(name)
+        if prop is None:
+            errors.append(f"缺少属性「{name}」({prop_type})")
+        elif prop["type"] != prop_type:
+            errors.append(f"属性「{name}」的类型为 {prop['type']}，应为 {prop_type}")
+    if errors:
+        raise SchemaError("划线数据库结构不匹配: " + "; ".join(errors))
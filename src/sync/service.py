@@ -1,17 +1,51 @@
 import asyncio
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from dataclasses import asdict, replace
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime
 
 from ..weread.api_client import WeReadApiClient
+from ..weread.errors import AuthExpiredError
+from ..weread.cache import ResponseCache
 from ..notion.client import NotionClient
-from ..models import BookInfo, ReadingNote, BookReview, SyncResult
+from ..notion.reconcile import build_page_items
+from ..models import (
+    BookInfo, ReadingNote, BookReview, SyncResult, BookPayload, BookSyncState, NoteBlockRef, SyncFilters,
+    SyncCheckpoint, PendingMutation
+)
+from .state import SyncStateStore, DEFAULT_STATE_PATH
 
 
 class SyncService:
     """微信读书到 Notion 的同步服务"""
     
-    def __init__(self, weread_cookie: str, notion_token: str, notion_database_id: str):
+    # 估算单本书耗时用的微信读书请求数（书籍信息、阅读进度、划线、书评）；
+    # 设置截止时间且尚无书籍完成时，按当前速率下这些请求的间隔保守估算
+    ESTIMATED_BOOK_REQUESTS = 4
+    
+    def __init__(
+        self,
+        weread_cookie: str,
+        notion_token: str,
+        notion_database_id: str,
+        weread_rate_limit: int = 5,
+        notion_rate_limit: int = 3,
+        weread_min_rate_limit: Optional[float] = None,
+        weread_max_rate_limit: Optional[float] = None,
+        weread_rate_burst: int = 1,
+        fetch_concurrency: int = 2,
+        write_concurrency: int = 2,
+        queue_size: int = 10,
+        state_path: str = DEFAULT_STATE_PATH,
+        cache_path: Optional[str] = None,
+        cache_expire_time: int = 3600,
+        filters: Optional[SyncFilters] = None,
+        notion_property_names: Optional[Dict[str, str]] = None,
+        highlights_database_id: Optional[str] = None
+    ):
         """
         初始化同步服务
         
@@ -19,9 +53,53 @@ class SyncService:
             weread_cookie: 微信读书 Cookie
             notion_token: Notion API Token
             notion_database_id: Notion 数据库 ID
+            weread_rate_limit: 微信读书每60秒的初始请求次数（抓取端预算，运行中自适应调整）
+            notion_rate_limit: Notion 每秒最多请求次数（写入端预算）
+            weread_min_rate_limit: 微信读书自适应限流的速率下限（每60秒）
+            weread_max_rate_limit: 微信读书自适应限流的速率上限（每60秒）
+            weread_rate_burst: 微信读书空闲后允许连续发出的请求数
+            fetch_concurrency: 并发抓取微信读书数据的 worker 数
+            write_concurrency: 并发写入 Notion 的 worker 数
+            queue_size: 抓取端与写入端之间缓冲队列的容量
+            state_path: 本地同步状态库（SQLite）路径
+            cache_path: 微信读书响应缓存（SQLite）路径，为 None 时不缓存
+            cache_expire_time: 未单独配置过期时间的接口的缓存时长（秒）
+            filters: 书籍与笔记的筛选条件
+            notion_property_names: 书籍字段 → Notion 数据库中的自定义属性名
+            highlights_database_id: Notion 划线数据库 ID；设置后每条划线额外写入为该数据库中的一行
         """
-        self.weread_client = WeReadApiClient(cookie=weread_cookie, rate_limit=5)
-        self.notion_client = NotionClient(token=notion_token, database_id=notion_database_id)
+        self.response_cache = ResponseCache(cache_path, default_ttl=cache_expire_time) if cache_path else None
+        self.weread_client = WeReadApiClient(
+            cookie=weread_cookie,
+            rate_limit=weread_rate_limit,
+            min_rate_limit=weread_min_rate_limit,
+            max_rate_limit=weread_max_rate_limit,
+            rate_burst=weread_rate_burst,
+            cache=self.response_cache
+        )
+        self.notion_client = NotionClient(
+            token=notion_token,
+            database_id=notion_database_id,
+            rate_limit=notion_rate_limit,
+            property_names=notion_property_names,
+            highlights_database_id=highlights_database_id
+        )
+        self.fetch_concurrency = max(1, fetch_concurrency)
+        self.write_concurrency = max(1, write_concurrency)
+        self.queue_size = max(1, queue_size)
+        self.state_store = SyncStateStore(state_path)
+        self.filters = filters or SyncFilters()
+        # 本次运行中被筛选条件排除的笔记数
+        self.excluded_notes = 0
+        # 本次运行中因时间预算不足而推迟的书籍数
+        self.deferred_books = 0
+        # 本次运行中写入划线数据库的行数与失败数
+        self.highlights_written = 0
+        self.highlights_failed = 0
+        # 批量预取的章节信息（书籍 ID → 章节字典）
+        self._chapter_cache: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # 书架接口批量返回的阅读进度（书籍 ID → 进度）
+        self._progress: Dict[str, Dict[str, Any]] = {}
         self.logger = logging.getLogger(__name__)
     
     async def __aenter__(self):
@@ -32,14 +110,28 @@ class SyncService:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
         await self.weread_client.__aexit__(exc_type, exc_val, exc_tb)
+        self.state_store.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
     
-    async def sync_all_books(self, include_finished: bool = True, include_unfinished: bool = True) -> List[SyncResult]:
+    async def sync_all_books(
+        self,
+        include_finished: bool = True,
+        include_unfinished: bool = True,
+        force: bool = False,
+        resume: bool = False,
+        deadline_at: Optional[float] = None
+    ) -> List[SyncResult]:
         """
         同步所有书籍
         
         Args:
             include_finished: 是否包含已读完的书籍
             include_unfinished: 是否包含未读完的书籍
+            force: 是否忽略本地同步状态，强制重新同步所有书籍
+            resume: 是否从上次未完成的运行继续（跳过已完成的书籍，失败的书籍优先）
+            deadline_at: 截止时间（time.monotonic() 时间戳，通常由进程启动时间加时间预算得出）；
+                剩余时间不足以完成下一本书时停止调度新书籍
             
         Returns:
             同步结果列表
@@ -47,8 +139,15 @@ class SyncService:
         self.logger.info("🚀 开始同步微信读书数据到 Notion...")
         
         results = []
+        self.excluded_notes = 0
+        self.deferred_books = 0
+        self.highlights_written = 0
+        self.highlights_failed = 0
         
         try:
+            # 在请求微信读书之前校验数据库结构，配置错误时只消耗一次请求
+            await self.validate_schema()
+            
             # 获取笔记本列表（有笔记的书籍）
             notebooks = await self.weread_client.get_notebook_list()
             self.logger.info(f"📚 找到 {len(notebooks)} 本有笔记的书籍")
@@ -58,6 +157,9 @@ class SyncService:
             shelf_books = entire_shelf.get('books', [])
             self.logger.info(f"📖 书架总计 {len(shelf_books)} 本书籍")
             
+            # 书架接口已包含所有书籍的阅读进度，无需逐本请求
+            self._load_progress(entire_shelf)
+            
             # 合并书籍信息，优先处理有笔记的书籍
             books_to_sync = {}
             
@@ -66,6 +168,8 @@ class SyncService:
                 book_id = notebook['bookId']
                 books_to_sync[book_id] = {
                     'book_info': notebook,
+                    'notebook': notebook,
+                    'shelf': None,
                     'has_notes': True
                 }
             
@@ -75,45 +179,60 @@ class SyncService:
                 if book_id not in books_to_sync:
                     books_to_sync[book_id] = {
                         'book_info': shelf_book,
+                        'notebook': None,
+                        'shelf': shelf_book,
                         'has_notes': False
                     }
+                else:
+                    books_to_sync[book_id]['shelf'] = shelf_book
+            
+            # 在发起任何单书请求之前按筛选条件排除书籍
+            books_to_sync, excluded = self._select_books(books_to_sync, include_finished, include_unfinished)
+            if excluded:
+                details = ", ".join(f"{reason}: {count}" for reason, count in excluded.items())
+                self.logger.info(f"🔍 按筛选条件排除 {sum(excluded.values())} 本书籍 ({details})")
+            
+            # 打开检查点；续跑时跳过上次已完成的书籍，并优先重试失败的书籍
+            checkpoint = self.state_store.open_checkpoint(self.notion_client.database_id, resume)
+            if checkpoint.resumed:
+                books_to_sync = self._apply_checkpoint(books_to_sync, checkpoint)
             
             self.logger.info(f"📋 准备同步 {len(books_to_sync)} 本书籍")
             
-            # 同步每本书
-            for i, (book_id, book_data) in enumerate(books_to_sync.items(), 1):
-                try:
-                    self.logger.info(f"📖 [{i}/{len(books_to_sync)}] 同步书籍: {book_data['book_info'].get('title', '未知书籍')}")
-                    
-                    result = await self.sync_single_book(book_id, book_data['has_notes'])
-                    results.append(result)
-                    
-                    if result.success:
-                        self.logger.info(f"✅ 同步成功: {result.book_title} (笔记: {result.notes_synced}, 书评: {result.reviews_synced})")
-                    else:
-                        self.logger.error(f"❌ 同步失败: {result.book_title} - {result.error_message}")
-                    
-                    # 添加延迟避免请求过于频繁
-                    await asyncio.sleep(1)
-                    
-                except Exception as e:
-                    error_msg = f"同步书籍 {book_id} 时发生错误: {str(e)}"
-                    self.logger.error(error_msg)
-                    results.append(SyncResult(
-                        success=False,
-                        book_id=book_id,
-                        book_title=book_data['book_info'].get('title', '未知书籍'),
-                        notes_synced=0,
-                        reviews_synced=0,
-                        error_message=error_msg
-                    ))
+            # 一次性加载 Notion 页面索引，后续创建/更新判断均在内存中完成
+            await self._load_page_index(full_scan=True)
+            await self._load_highlight_index()
+            
+            # 抓取与写入流水线并行执行
+            results = await self._run_pipeline(
+                books_to_sync, force=force, run_id=checkpoint.run_id, deadline_at=deadline_at
+            )
+            
+            # 登录失效中止或有书籍被推迟的运行保持未完成状态，下次可以续跑
+            if not self.weread_client.circuit_open and not self.deferred_books:
+                self.state_store.finish_run(checkpoint.run_id)
             
             # 统计结果
             success_count = sum(1 for r in results if r.success)
+            skipped_count = sum(1 for r in results if r.skipped)
             total_notes = sum(r.notes_synced for r in results)
             total_reviews = sum(r.reviews_synced for r in results)
             
-            self.logger.info(f"🎉 同步完成! 成功: {success_count}/{len(results)}, 笔记: {total_notes}, 书评: {total_reviews}")
+            self.logger.info(f"🎉 同步完成! 成功: {success_count}/{len(results)} (未变化跳过: {skipped_count}), 笔记: {total_notes}, 书评: {total_reviews}")
+            if self.excluded_notes:
+                self.logger.info(f"🔍 按筛选条件排除笔记: {self.excluded_notes} 条")
+            if self.notion_client.highlights_database_id:
+                self.logger.info(f"✏️  划线数据库: 写入 {self.highlights_written} 行, 失败 {self.highlights_failed} 行")
+            if self.weread_client.circuit_open:
+                self.logger.error("🔑 微信读书Cookie已失效，请更新 WEREAD_COOKIE 后重新同步")
+            self.logger.info(f"🚦 微信读书当前请求速率: {self.weread_client.current_rate:.1f} 次/分钟")
+            notion_stats = self.notion_client.rate_limiter.stats()
+            self.logger.info(
+                f"🚦 Notion 请求: {notion_stats['requests']} 次, 限流: {notion_stats['throttled']} 次, "
+                f"平均等待: {notion_stats['avg_wait']:.2f}s, 预算利用率: {notion_stats['utilization']:.0%}"
+            )
+            if self.response_cache is not None:
+                self.logger.info(f"🗃️  响应缓存命中: {self.response_cache.hits}, 未命中: {self.response_cache.misses}")
             
         except Exception as e:
             self.logger.error(f"❌ 同步过程中发生错误: {str(e)}")
@@ -121,6 +240,191 @@ class SyncService:
         
         return results
     
+    async def _run_pipeline(
+        self,
+        books_to_sync: Dict[str, Dict[str, Any]],
+        force: bool = False,
+        run_id: Optional[str] = None,
+        deadline_at: Optional[float] = None
+    ) -> List[SyncResult]:
+        """
+        以生产者/消费者流水线同步书籍
+        
+        抓取 worker 从微信读书获取数据并放入有界队列，写入 worker 从队列取出后写入 Notion，
+        两端各自受 ``fetch_concurrency`` / ``write_concurrency`` 及各自客户端的限流器约束。
+        待处理的书籍按价值排序（上次失败、有新笔记、最近阅读优先）；设置截止时间时，
+        剩余时间不足以完成下一本书（按已完成书籍的平均耗时估算，
+        尚无完成的书籍时按微信读书限流速率保守估算）就停止调度，已开始的写入照常完成。
+        
+        Args:
+            books_to_sync: 书籍 ID 到书籍数据的映射
+            force: 是否忽略本地同步状态
+            run_id: 检查点的运行 ID，提供时每本书处理完成后立即记录结果
+            deadline_at: 截止时间（time.monotonic() 时间戳）
+            
+        Returns:
+            与输入顺序一致的同步结果列表
+        """
+        total = len(books_to_sync)
+        results: List[Optional[SyncResult]] = [None] * total
+        
+        def finish(index: int, result: SyncResult):
+            results[index] = result
+            if run_id:
+                self.state_store.record_run_book(run_id, result.book_id, result.success, result.error_message)
+        
+        queued = []
+        priorities: Dict[int, Tuple] = {}
+        for index, (book_id, book_data) in enumerate(books_to_sync.items()):
+            title = self._get_entry_title(book_data['book_info'])
+            fingerprint = self._build_fingerprint(book_data)
+            
+            state = self.state_store.get_book(book_id, self.notion_client.database_id)
+            
+            # 书架/笔记本摘要与上次同步一致时，不发起任何单书请求
+            if not force and self._is_unchanged(state, fingerprint):
+                self.logger.debug(f"⏭️  [{index + 1}/{total}] 未变化，跳过: {title}")
+                finish(index, self._skipped_result(book_id, title, state.notion_page_id))
+                continue
+            
+            queued.append((index, book_id, book_data, title, fingerprint))
+            priorities[index] = self._priority(book_id, book_data, fingerprint, state)
+        
+        queued.sort(key=lambda entry: priorities[entry[0]])
+        
+        # 一次性批量获取所有待同步且有笔记的书籍的章节信息（章节只用于读书笔记）
+        if self.filters.sync_reading_notes:
+            await self._prefetch_chapters({
+                book_id: fingerprint['update_time']
+                for _, book_id, book_data, _, fingerprint in queued if book_data['has_notes']
+            })
+        
+        pending: asyncio.Queue = asyncio.Queue()
+        for entry in queued:
+            pending.put_nowait(entry)
+        prepared: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        
+        # 熔断：出现登录失效后中止正在抓取和排队中的书籍
+        aborted = asyncio.Event()
+        in_flight: Dict[int, Tuple[str, str]] = {}
+        
+        # 截止时间：记录每本书的总耗时与写入耗时，用于估算能否在剩余时间内完成下一本
+        out_of_time = asyncio.Event()
+        started: Dict[int, float] = {}
+        book_costs: List[float] = []
+        write_costs: List[float] = []
+        
+        def has_budget() -> bool:
+            if deadline_at is None:
+                return True
+            remaining = deadline_at - time.monotonic()
+            if not book_costs:
+                # 尚无实测耗时：按微信读书限流速率保守估算，已开始的书籍都计入待写入量
+                book_cost = self.ESTIMATED_BOOK_REQUESTS * 60 / self.weread_client.current_rate
+                return remaining > book_cost * (1 + len(started) / self.fetch_concurrency)
+            book_cost = sum(book_costs) / len(book_costs)
+            write_backlog = prepared.qsize() * (sum(write_costs) / len(write_costs)) / self.write_concurrency
+            return remaining > book_cost + write_backlog
+        
+        async def fetch_worker():
+            while not aborted.is_set():
+                if out_of_time.is_set() or not has_budget():
+                    out_of_time.set()
+                    return
+                
+                try:
+                    index, book_id, book_data, title, fingerprint = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                self.logger.info(f"📖 [{index + 1}/{total}] 获取书籍: {title}")
+                in_flight[index] = (book_id, title)
+                started[index] = time.monotonic()
+                try:
+                    payload = await self._fetch_book(
+                        book_id,
+                        book_data['has_notes'],
+                        full=force,
+                        update_time=fingerprint['update_time'],
+                        entry=self._entry_metadata(book_id, book_data)
+                    )
+                    payload.fingerprint = fingerprint
+                except AuthExpiredError as e:
+                    in_flight.pop(index, None)
+                    started.pop(index, None)
+                    finish(index, self._failed_result(book_id, title, str(e)))
+                    if not aborted.is_set():
+                        self.logger.error(f"🔌 微信读书登录已失效，中止剩余书籍的同步: {e}")
+                        aborted.set()
+                        current = asyncio.current_task()
+                        for task in fetchers:
+                            if task is not current:
+                                task.cancel()
+                    return
+                except Exception as e:
+                    in_flight.pop(index, None)
+                    started.pop(index, None)
+                    error_msg = f"同步书籍 {book_id} 时发生错误: {str(e)}"
+                    self.logger.error(f"❌ 同步失败: {title} - {error_msg}")
+                    finish(index, self._failed_result(book_id, title, error_msg))
+                    continue
+                
+                # 入队完成后才移出 in_flight：队列已满时被熔断取消的书籍仍会记为失败
+                await prepared.put((index, payload))
+                in_flight.pop(index, None)
+        
+        async def write_worker():
+            while True:
+                item = await prepared.get()
+                if item is None:
+                    return
+                
+                index, payload = item
+                write_started = time.monotonic()
+                result = await self._write_book(payload, force=force)
+                finish(index, result)
+                
+                now = time.monotonic()
+                write_costs.append(now - write_started)
+                book_costs.append(now - started.pop(index, write_started))
+                
+                if result.success:
+                    self.logger.info(f"✅ 同步成功: {result.book_title} (笔记: {result.notes_synced}, 书评: {result.reviews_synced})")
+                else:
+                    self.logger.error(f"❌ 同步失败: {result.book_title} - {result.error_message}")
+        
+        fetchers = [asyncio.create_task(fetch_worker()) for _ in range(self.fetch_concurrency)]
+        writers = [asyncio.create_task(write_worker()) for _ in range(self.write_concurrency)]
+        
+        try:
+            # 熔断时其余抓取 worker 会被取消，这里收集取消结果而不抛出
+            await asyncio.gather(*fetchers, return_exceptions=True)
+            
+            if aborted.is_set():
+                # 已抓取完成的书籍仍会写入 Notion；正在抓取和排队中的书籍记为失败（不计入检查点，续跑时照常处理）
+                abort_msg = "微信读书登录已失效，已中止同步"
+                for index, (book_id, title) in in_flight.items():
+                    results[index] = self._failed_result(book_id, title, abort_msg)
+                while not pending.empty():
+                    index, book_id, _, title, _ = pending.get_nowait()
+                    results[index] = self._failed_result(book_id, title, abort_msg)
+            
+            if out_of_time.is_set():
+                # 未调度的书籍不计入结果与检查点，下次（--resume）继续
+                self.deferred_books = pending.qsize()
+                self.logger.warning(f"⏳ 剩余时间不足，{self.deferred_books} 本书籍推迟到下次同步")
+            
+            # 抓取结束后通知写入端退出
+            for _ in writers:
+                await prepared.put(None)
+            await asyncio.gather(*writers)
+        finally:
+            for task in fetchers + writers:
+                if not task.done():
+                    task.cancel()
+        
+        return [result for result in results if result is not None]
+    
     async def sync_single_book(self, book_id: str, has_notes: bool = True) -> SyncResult:
         """
         同步单本书籍
@@ -133,66 +437,658 @@ class SyncService:
             同步结果
         """
         try:
-            # 获取书籍基本信息
-            book_info_raw = await self.weread_client.get_book_info(book_id)
+            payload = await self._fetch_book(book_id, has_notes)
+        except Exception as e:
+            return self._failed_result(book_id, "未知书籍", str(e))
+        
+        return await self._write_book(payload)
+    
+    async def _fetch_book(
+        self,
+        book_id: str,
+        has_notes: bool = True,
+        full: bool = False,
+        update_time: Any = None,
+        entry: Optional[Dict[str, Any]] = None
+    ) -> BookPayload:
+        """
+        从微信读书获取单本书籍的全部数据
+        
+        Args:
+            book_id: 书籍 ID
+            has_notes: 是否有笔记
+            full: 是否忽略本地笔记缓存，全量获取划线与笔记
+            update_time: 书籍的 updateTime，用于判断缓存的章节是否失效
+            entry: 书架/笔记本条目中已有的书籍元数据
             
-            # 获取阅读进度
+        Returns:
+            待写入 Notion 的书籍数据
+        """
+        # 获取书籍基本信息：已有页面只会更新阅读状态，书架条目足够；新页面才需要简介等详细信息
+        detailed = entry is None or self._needs_book_details(book_id, entry)
+        if detailed:
+            book_info_raw = {**(entry or {}), **await self.weread_client.get_book_info(book_id)}
+        else:
+            book_info_raw = entry
+        
+        # 获取阅读进度（优先使用书架接口的批量数据）
+        read_info = self._progress.get(book_id)
+        if read_info is None:
             read_info = await self.weread_client.get_read_info(book_id)
+        
+        # 构建书籍信息对象
+        book_info = await self._build_book_info(book_info_raw, read_info)
+        
+        # 获取笔记和书评
+        notes = []
+        reviews = []
+        excluded_ids: List[str] = []
+        
+        if has_notes and (self.filters.sync_reading_notes or self.filters.sync_book_reviews):
+            # 获取笔记/想法（增量；书评与想法共用该接口）
+            review_list = await self._fetch_notebook_items(book_id, 'reviews', full)
             
-            # 构建书籍信息对象
-            book_info = await self._build_book_info(book_info_raw, read_info)
-            
-            # 获取笔记和书评
-            notes = []
-            reviews = []
-            
-            if has_notes:
-                # 获取划线记录
-                bookmarks = await self.weread_client.get_bookmark_list(book_id)
+            # 划线与章节信息只用于读书笔记，关闭笔记同步时不请求
+            if self.filters.sync_reading_notes:
+                # 获取划线记录（增量）
+                bookmarks = await self._fetch_notebook_items(book_id, 'bookmarks', full)
                 
-                # 获取笔记/想法
-                review_list = await self.weread_client.get_review_list(book_id)
-                
-                # 获取章节信息
-                chapters = await self.weread_client.get_chapter_info(book_id)
+                # 获取章节信息（优先使用批量预取的结果）
+                chapters = self._chapter_cache.pop(book_id, None)
+                if chapters is None:
+                    chapters = await self.weread_client.get_chapter_info(book_id, version=update_time)
                 
                 # 处理笔记
-                notes = await self._build_reading_notes(bookmarks, review_list, chapters, book_id)
-                
-                # 处理书评
-                reviews = await self._build_book_reviews(review_list, book_id)
+                notes = await self._build_reading_notes(bookmarks, review_list, chapters, book_id, excluded_ids)
+            
+            # 处理书评
+            reviews = await self._build_book_reviews(review_list, book_id)
+        
+        return BookPayload(
+            book_info=book_info, notes=notes, reviews=reviews, detailed=detailed, excluded_ids=excluded_ids
+        )
+    
+    def _priority(
+        self,
+        book_id: str,
+        book_data: Dict[str, Any],
+        fingerprint: Dict[str, Any],
+        state: Optional[BookSyncState]
+    ) -> Tuple:
+        """
+        计算书籍的调度优先级（值越小越先处理）
+        
+        上次失败需要重试的书籍最先，其次是有新笔记的书籍，再按最近阅读时间与笔记本排序。
+        """
+        has_new_notes = book_data['has_notes'] and (
+            state is None
+            or state.note_count != fingerprint['note_count']
+            or state.review_count != fingerprint['review_count']
+            or state.bookmark_count != fingerprint['bookmark_count']
+        )
+        read_time = fingerprint['read_update_time'] or (self._progress.get(book_id) or {}).get('readUpdateTime') or 0
+        return (
+            0 if book_data.get('retry') else 1,
+            0 if has_new_notes else 1,
+            -read_time,
+            -(fingerprint['sort'] or 0)
+        )
+    
+    def _apply_checkpoint(
+        self,
+        books_to_sync: Dict[str, Dict[str, Any]],
+        checkpoint: SyncCheckpoint
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        按检查点调整待同步书籍：去掉已完成的书籍，上次失败的书籍排在最前
+        
+        Args:
+            books_to_sync: 书籍 ID 到书籍数据的映射
+            checkpoint: 上次未完成运行的检查点
+            
+        Returns:
+            调整后的映射
+        """
+        completed = set(checkpoint.completed)
+        remaining = {book_id: data for book_id, data in books_to_sync.items() if book_id not in completed}
+        failed_first = {book_id: remaining[book_id] for book_id in checkpoint.failed if book_id in remaining}
+        for book_data in failed_first.values():
+            book_data['retry'] = True
+        
+        self.logger.info(
+            f"♻️  续跑 {checkpoint.run_id}: 跳过已完成 {len(books_to_sync) - len(remaining)} 本，"
+            f"优先重试失败 {len(failed_first)} 本"
+        )
+        return {**failed_first, **remaining}
+    
+    def _select_books(
+        self,
+        books_to_sync: Dict[str, Dict[str, Any]],
+        include_finished: bool,
+        include_unfinished: bool
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+        """
+        根据书架/笔记本数据筛选需要同步的书籍，不发起网络请求
+        
+        Args:
+            books_to_sync: 书籍 ID 到书籍数据的映射
+            include_finished: 是否包含已读完的书籍
+            include_unfinished: 是否包含未读完的书籍
             
-            # 检查 Notion 中是否已存在该书籍
-            existing_page = await self.notion_client.find_book_page(book_id)
+        Returns:
+            (筛选后的映射, 排除原因 → 书籍数)
+        """
+        selected = {}
+        excluded: Dict[str, int] = {}
+        
+        for book_id, book_data in books_to_sync.items():
+            metadata = self._entry_metadata(book_id, book_data)
+            finished = metadata.get('finishReading')
+            progress = (self._progress.get(book_id) or {}).get('progress', 0)
+            
+            reason = None
+            if finished is not None and finished == 1 and not include_finished:
+                reason = '已读完'
+            elif finished is not None and finished != 1 and not include_unfinished:
+                reason = '未读完'
+            elif not book_data['has_notes'] and not self.filters.include_books_without_notes:
+                reason = '无笔记'
+            elif not book_data['has_notes'] and not progress and self.filters.exclude_empty_books:
+                reason = '无内容'
             
-            if existing_page:
-                # 更新现有页面
-                page_id = existing_page['id']
-                await self.notion_client.update_book_page(page_id, book_info, notes, reviews)
+            if reason:
+                excluded[reason] = excluded.get(reason, 0) + 1
+            else:
+                selected[book_id] = book_data
+        
+        return selected, excluded
+    
+    def _keep_note(self, content: str, is_private: bool) -> bool:
+        """判断笔记是否满足筛选条件"""
+        if self.filters.exclude_private_notes and is_private:
+            return False
+        return len(content or '') >= self.filters.min_note_length
+    
+    def _entry_metadata(self, book_id: str, book_data: Dict[str, Any]) -> Dict[str, Any]:
+        """合并笔记本条目（book 字段）与书架条目中的书籍元数据"""
+        metadata: Dict[str, Any] = {}
+        metadata.update((book_data.get('notebook') or {}).get('book') or {})
+        metadata.update(book_data.get('shelf') or {})
+        metadata['bookId'] = book_id
+        return metadata
+    
+    def _needs_book_details(self, book_id: str, entry: Dict[str, Any]) -> bool:
+        """
+        判断是否需要调用 get_book_info
+        
+        已有页面的更新只写入阅读状态，书架条目中的字段即可满足；
+        新页面或条目缺少完成状态时才请求详细信息。
+        """
+        if 'finishReading' not in entry:
+            return True
+        return book_id not in (self.notion_client.page_index or {})
+    
+    async def _with_book_details(self, book_info: BookInfo) -> BookInfo:
+        """补充书籍的详细信息，保留已获取的阅读进度"""
+        book_info_raw = await self.weread_client.get_book_info(book_info.book_id)
+        detailed = await self._build_book_info(book_info_raw, {})
+        return replace(
+            detailed,
+            book_id=book_info.book_id,
+            read_progress=book_info.read_progress,
+            last_read_time=book_info.last_read_time
+        )
+    
+    def _load_progress(self, entire_shelf: Dict[str, Any]):
+        """
+        从书架接口的 bookProgress 构建阅读进度映射
+        
+        Args:
+            entire_shelf: 书架接口的响应
+        """
+        self._progress = {
+            entry['bookId']: {
+                'progress': entry.get('progress', 0),
+                'readUpdateTime': entry.get('updateTime', 0)
+            }
+            for entry in entire_shelf.get('bookProgress', [])
+            if entry.get('bookId')
+        }
+        self.logger.debug(f"📈 已从书架获取 {len(self._progress)} 本书的阅读进度")
+    
+    async def _prefetch_chapters(self, versions: Dict[str, Any]):
+        """
+        批量预取章节信息，失败时回退为逐本获取
+        
+        Args:
+            versions: 需要章节信息的书籍 ID → 书籍 updateTime
+        """
+        if not versions:
+            return
+        
+        book_ids = list(versions)
+        try:
+            chapters = await self.weread_client.get_chapter_infos(book_ids, versions=versions)
+        except AuthExpiredError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"⚠️  批量获取章节信息失败，将逐本获取: {e}")
+            return
+        
+        self._chapter_cache.update(chapters)
+        self.logger.info(f"📑 已批量获取 {len(chapters)}/{len(book_ids)} 本书的章节信息")
+    
+    async def _fetch_notebook_items(self, book_id: str, kind: str, full: bool = False) -> List[Dict[str, Any]]:
+        """
+        按 synckey 增量获取划线或笔记，并与本地缓存合并
+        
+        Args:
+            book_id: 书籍 ID
+            kind: bookmarks（划线）或 reviews（笔记/想法）
+            full: 是否忽略缓存，全量获取
+            
+        Returns:
+            合并后的全部条目
+        """
+        if kind == 'bookmarks':
+            fetch_changes = self.weread_client.get_bookmark_changes
+            id_key = 'bookmarkId'
+        else:
+            fetch_changes = self.weread_client.get_review_changes
+            id_key = 'reviewId'
+        
+        cached = None if full else self.state_store.get_notebook_cache(book_id, kind)
+        synckey = cached[0] if cached else 0
+        
+        changes = await fetch_changes(book_id, synckey)
+        
+        if synckey and changes.get('synckey') is not None:
+            # 在缓存上应用增量：删除已移除的条目，覆盖新增或修改的条目
+            items = {item.get(id_key): item for item in cached[1]}
+            for removed in changes.get('removed') or []:
+                removed_id = removed.get(id_key) if isinstance(removed, dict) else removed
+                items.pop(removed_id, None)
+            for item in changes['updated']:
+                items[item.get(id_key)] = item
+            merged = list(items.values())
+        else:
+            # 首次获取、强制全量或接口未返回 synckey 时，以响应为全量数据
+            merged = changes['updated']
+        
+        self.state_store.save_notebook_cache(book_id, kind, changes.get('synckey') or 0, merged)
+        return merged
+    
+    async def _write_book(self, payload: BookPayload, force: bool = False) -> SyncResult:
+        """
+        将书籍数据写入 Notion
+        
+        Args:
+            payload: 抓取阶段得到的书籍数据
+            force: 是否忽略内容哈希，强制写入
+            
+        Returns:
+            同步结果
+        """
+        book_info = payload.book_info
+        notes = payload.notes
+        reviews = payload.reviews
+        database_id = self.notion_client.database_id
+        content_hash = self._hash_payload(payload)
+        
+        try:
+            # 渲染内容与上次写入一致时跳过 Notion 写入，仅刷新摘要
+            state = self.state_store.get_book(book_info.book_id, database_id)
+            if (
+                not force and state and state.notion_page_id
+                and state.content_hash == content_hash
+                and self._page_exists(book_info.book_id, state.notion_page_id)
+            ):
+                self._save_state(payload, state.notion_page_id, content_hash)
+                if self._highlights_pending(book_info.book_id):
+                    await self._sync_highlights(book_info.book_id, state.notion_page_id, notes)
+                return self._skipped_result(book_info.book_id, book_info.title, state.notion_page_id)
+            
+            # 通过页面索引判断 Notion 中是否已存在该书籍
+            page_id = await self.notion_client.resolve_page_id(book_info.book_id)
+            
+            # 写入前记录预写日志，运行中断时下次启动据此确认或清理
+            mutation_id = self.state_store.begin_mutation(
+                database_id, book_info.book_id, "update" if page_id else "create", content_hash
+            )
+            
+            if page_id:
+                # 更新页面属性（只写入变化的部分），并按块对账笔记和书评
+                await self.notion_client.update_book_page(
+                    page_id,
+                    book_info,
+                    previous_properties=self.state_store.get_page_properties(page_id)
+                )
+                notes_synced, reviews_synced = await self._reconcile_page(
+                    page_id, notes, reviews, payload.excluded_ids
+                )
                 notion_page_id = page_id
             else:
-                # 创建新页面
-                new_page = await self.notion_client.create_book_page(book_info, notes, reviews)
+                # 创建新页面（需要简介、ISBN 等详细信息）
+                if not payload.detailed:
+                    book_info = await self._with_book_details(book_info)
+                new_page = await self.notion_client.create_book_page(
+                    book_info, notes, reviews,
+                    on_created=lambda created_id: self.state_store.set_mutation_page(mutation_id, created_id)
+                )
                 notion_page_id = new_page['id']
+                self.notion_client.remember_page(book_info.book_id, notion_page_id)
+                self.state_store.save_page_items(notion_page_id, new_page.get('item_blocks', {}))
+                notes_synced, reviews_synced = len(notes), len(reviews)
+            
+            self.state_store.set_page_id(database_id, book_info.book_id, notion_page_id)
+            self.state_store.save_page_properties(notion_page_id, self.notion_client.progress_properties(book_info))
+            self._save_state(payload, notion_page_id, content_hash)
+            self.state_store.complete_mutation(mutation_id)
+            
+            if self.notion_client.highlights_database_id:
+                await self._sync_highlights(book_info.book_id, notion_page_id, notes)
             
             return SyncResult(
                 success=True,
-                book_id=book_id,
+                book_id=book_info.book_id,
                 book_title=book_info.title,
-                notes_synced=len(notes),
-                reviews_synced=len(reviews),
+                notes_synced=notes_synced,
+                reviews_synced=reviews_synced,
                 notion_page_id=notion_page_id
             )
             
         except Exception as e:
-            return SyncResult(
-                success=False,
-                book_id=book_id,
-                book_title="未知书籍",
-                notes_synced=0,
-                reviews_synced=0,
-                error_message=str(e)
-            )
+            return self._failed_result(book_info.book_id, book_info.title, str(e))
+    
+    async def _reconcile_page(
+        self,
+        page_id: str,
+        notes: List[ReadingNote],
+        reviews: List[BookReview],
+        excluded_ids: Optional[List[str]] = None
+    ) -> Tuple[int, int]:
+        """
+        将页面中的笔记和书评与微信读书对账，只写入新增、编辑和删除的部分
+        
+        被筛选条件排除的条目和关闭同步的类型不参与对账，已写入的块保持不动。
+        
+        没有本地追踪记录的已有页面（旧版本创建，或本地状态库丢失）先扫描一次页面，
+        按内容匹配已写入的条目，未匹配到的条目按新增写入。
+        
+        Args:
+            page_id: 页面 ID
+            notes: 当前全部笔记
+            reviews: 当前全部书评
+            excluded_ids: 被筛选条件排除的笔记 ID
+            
+        Returns:
+            (写入的笔记数, 写入的书评数)
+        """
+        known = self.state_store.get_page_items(page_id)
+        if known is None:
+            known = await self.notion_client.match_page_items(page_id, build_page_items(notes, reviews))
+            self.logger.info(f"🔎 页面没有追踪记录，按内容匹配到 {len(known)} 条已写入的条目")
+        
+        protected = self._protected_items(known, notes, reviews, excluded_ids or [])
+        active = {item_id: ref for item_id, ref in known.items() if item_id not in protected}
+        
+        # 页面中的笔记数包括被筛选条件排除但仍保留在页面中的笔记；关闭笔记同步时不更新标题
+        note_count = None
+        if self.filters.sync_reading_notes:
+            note_count = len(notes) + len(set(excluded_ids or []) & set(known))
+        refs = await self.notion_client.reconcile_book_page(page_id, notes, reviews, active, note_count)
+        refs.update({item_id: known[item_id] for item_id in protected})
+        self.state_store.save_page_items(page_id, refs)
+        
+        changed = {item_id for item_id, ref in refs.items() if known.get(item_id) != ref}
+        return (
+            sum(1 for note in notes if note.note_id in changed),
+            sum(1 for review in reviews if review.review_id in changed)
+        )
+    
+    def _protected_items(
+        self,
+        known: Dict[str, NoteBlockRef],
+        notes: List[ReadingNote],
+        reviews: List[BookReview],
+        excluded_ids: List[str]
+    ) -> Set[str]:
+        """
+        找出不参与对账的已写入条目，避免把它们当作已删除
+        
+        包括被筛选条件排除的条目；关闭笔记同步时除当前书评外的全部条目；
+        关闭书评同步时除当前笔记外的 review_ 条目（书评与想法共用该前缀）。
+        """
+        protected = set(excluded_ids) & set(known)
+        if not self.filters.sync_reading_notes:
+            review_ids = {review.review_id for review in reviews}
+            protected |= {item_id for item_id in known if item_id not in review_ids}
+        if not self.filters.sync_book_reviews:
+            note_ids = {note.note_id for note in notes}
+            protected |= {item_id for item_id in known if item_id.startswith('review_') and item_id not in note_ids}
+        return protected
+    
+    def _failed_result(self, book_id: str, book_title: str, error_message: str) -> SyncResult:
+        """构建失败的同步结果"""
+        return SyncResult(
+            success=False,
+            book_id=book_id,
+            book_title=book_title,
+            notes_synced=0,
+            reviews_synced=0,
+            error_message=error_message
+        )
+    
+    def _skipped_result(self, book_id: str, book_title: str, notion_page_id: Optional[str]) -> SyncResult:
+        """构建因内容未变化而跳过的同步结果"""
+        return SyncResult(
+            success=True,
+            book_id=book_id,
+            book_title=book_title,
+            notes_synced=0,
+            reviews_synced=0,
+            notion_page_id=notion_page_id,
+            skipped=True
+        )
+    
+    def _build_fingerprint(self, book_data: Dict[str, Any]) -> Dict[str, Any]:
+        """根据笔记本与书架条目构建书籍变化摘要"""
+        notebook = book_data.get('notebook') or {}
+        shelf = book_data.get('shelf') or {}
+        return {
+            'note_count': notebook.get('noteCount', 0),
+            'review_count': notebook.get('reviewCount', 0),
+            'bookmark_count': notebook.get('bookmarkCount', 0),
+            'sort': notebook.get('sort'),
+            'update_time': shelf.get('updateTime') or notebook.get('book', {}).get('updateTime'),
+            'read_update_time': shelf.get('readUpdateTime')
+        }
+    
+    def _is_unchanged(self, state: Optional[BookSyncState], fingerprint: Dict[str, Any]) -> bool:
+        """判断书籍摘要是否与上次同步时一致"""
+        if state is None or not state.notion_page_id:
+            return False
+        if not self._page_exists(state.book_id, state.notion_page_id):
+            return False
+        if fingerprint.get('bookmark_count') and self._highlights_pending(state.book_id):
+            return False
+        return all(getattr(state, key) == value for key, value in fingerprint.items())
+    
+    def _page_exists(self, book_id: str, page_id: str) -> bool:
+        """根据完整的页面索引确认页面仍然存在（索引不完整时视为存在）"""
+        if not self.notion_client.page_index_complete:
+            return True
+        return self.notion_client.page_index.get(book_id) == page_id
+    
+    async def _load_page_index(self, full_scan: bool = True):
+        """
+        加载书籍ID → 页面 ID 索引
+        
+        Args:
+            full_scan: 是否分页扫描 Notion 数据库重建索引；否则仅使用本地持久化的索引
+        """
+        database_id = self.notion_client.database_id
+        await self._recover_mutations()
+        
+        if full_scan:
+            try:
+                index = await self.notion_client.load_page_index(
+                    preferred=self.state_store.load_page_index(database_id)
+                )
+                self.state_store.save_page_index(database_id, index)
+                self.logger.info(f"🗂️  已加载 Notion 页面索引: {len(index)} 本书籍")
+                await self._archive_duplicate_pages()
+                return
+            except Exception as e:
+                self.logger.warning(f"⚠️  扫描 Notion 数据库失败，使用本地索引: {str(e)}")
+        
+        self.notion_client.set_page_index(self.state_store.load_page_index(database_id))
+    
+    async def _load_highlight_index(self):
+        """启用划线数据库时，校验其结构并一次性扫描已有的划线ID → 页面 ID"""
+        if not self.notion_client.highlights_database_id:
+            return
+        index = await self.notion_client.load_highlight_index()
+        self.logger.info(f"🗂️  已加载划线数据库索引: {len(index)} 条划线")
+    
+    def _highlights_pending(self, book_id: str) -> bool:
+        """判断启用划线数据库时，书籍的划线是否尚未全部写入（新启用或上次写入失败）"""
+        database_id = self.notion_client.highlights_database_id
+        return bool(database_id) and not self.state_store.is_highlights_synced(database_id, book_id)
+    
+    async def _sync_highlights(self, book_id: str, book_page_id: str, notes: List[ReadingNote]):
+        """
+        将书籍的划线写入划线数据库（只写入新增和内容变化的行）
+        
+        全部写入成功后才标记书籍的划线已同步；有失败时保留未同步状态，
+        即使书籍内容哈希未变化，下次同步也会重试。
+        
+        Args:
+            book_id: 书籍 ID
+            book_page_id: 书籍页面 ID（划线通过关联属性指向它）
+            notes: 书籍的全部笔记，只处理其中的划线
+        """
+        rows = []
+        for note in notes:
+            if note.note_type != 'bookmark':
+                continue
+            highlight_id = note.note_id[len('bookmark_'):]
+            properties = self.notion_client.highlight_properties(note, highlight_id, book_page_id)
+            page_id = self.notion_client.highlight_index.get(highlight_id)
+            if page_id and self.state_store.get_page_properties(page_id) == properties:
+                continue
+            rows.append((highlight_id, properties))
+        
+        database_id = self.notion_client.highlights_database_id
+        if not rows:
+            self.state_store.set_highlights_synced(database_id, book_id, True)
+            return
+        
+        # 写入前清除标记，写入中断时下次同步会重试
+        self.state_store.set_highlights_synced(database_id, book_id, False)
+        outcomes = await self.notion_client.upsert_highlights(rows, concurrency=self.write_concurrency)
+        failed = 0
+        for (highlight_id, properties), outcome in zip(rows, outcomes):
+            if isinstance(outcome, Exception):
+                failed += 1
+                self.logger.warning(f"⚠️  写入划线 {highlight_id} 失败: {str(outcome)}")
+                continue
+            self.state_store.save_page_properties(outcome, properties)
+            self.highlights_written += 1
+        
+        self.highlights_failed += failed
+        self.state_store.set_highlights_synced(database_id, book_id, failed == 0)
+    
+    async def _recover_mutations(self):
+        """
+        处理上次运行中断时未确认的 Notion 写操作（预写日志）
+        
+        中断的创建操作留下的页面（未记入本地索引）会被归档，书籍在本次同步中重新创建；
+        中断的更新操作无需处理，书籍状态在写入完成后才保存，本次同步会按内容哈希重新写入。
+        """
+        database_id = self.notion_client.database_id
+        pending = self.state_store.pending_mutations(database_id)
+        if not pending:
+            return
+        
+        self.logger.info(f"🩹 发现 {len(pending)} 个未确认的 Notion 写操作，正在恢复")
+        confirmed = self.state_store.load_page_index(database_id)
+        for mutation in pending:
+            try:
+                if mutation.operation == "create":
+                    await self._recover_create(mutation, confirmed.get(mutation.book_id))
+                self.state_store.complete_mutation(mutation.mutation_id)
+            except Exception as e:
+                self.logger.warning(f"⚠️  恢复书籍 {mutation.book_id} 的写操作失败: {str(e)}")
+    
+    async def _recover_create(self, mutation: PendingMutation, confirmed_page_id: Optional[str]):
+        """
+        清理中断的创建操作留下的页面
+        
+        Args:
+            mutation: 未确认的创建操作
+            confirmed_page_id: 本地索引中记录的页面 ID
+        """
+        if mutation.page_id and mutation.page_id == confirmed_page_id:
+            return
+        
+        # 已记录页面 ID 时直接归档，无需查询（避免 Notion 查询索引延迟）
+        if mutation.page_id:
+            page_ids = [mutation.page_id]
+        else:
+            page_ids = [page["id"] for page in await self.notion_client.find_book_pages(mutation.book_id)]
+        
+        for page_id in page_ids:
+            if page_id != confirmed_page_id:
+                await self.notion_client.archive_page(page_id)
+                self.logger.info(f"🧹 已归档中断创建的页面: 书籍 {mutation.book_id}, 页面 {page_id}")
+    
+    async def _archive_duplicate_pages(self):
+        """归档完整扫描中发现的重复页面（同一书籍ID只保留一个页面）"""
+        archived = 0
+        for book_id, page_ids in self.notion_client.duplicate_pages.items():
+            for page_id in page_ids:
+                try:
+                    await self.notion_client.archive_page(page_id)
+                    archived += 1
+                except Exception as e:
+                    self.logger.warning(f"⚠️  归档重复页面失败: 书籍 {book_id}, 页面 {page_id}: {str(e)}")
+        if archived:
+            self.logger.info(f"🧹 已归档重复页面: {archived} 个")
+    
+    def _hash_payload(self, payload: BookPayload) -> str:
+        """计算待渲染内容的哈希（书籍信息只计入更新页面时会写入的字段）"""
+        book_info = payload.book_info
+        content = {
+            'book_info': {
+                'book_id': book_info.book_id,
+                'title': book_info.title,
+                'read_progress': book_info.read_progress,
+                'finish_reading': book_info.finish_reading,
+                'last_read_time': book_info.last_read_time
+            },
+            'notes': [asdict(note) for note in payload.notes],
+            'reviews': [asdict(review) for review in payload.reviews]
+        }
+        serialized = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+    
+    def _save_state(self, payload: BookPayload, notion_page_id: str, content_hash: str):
+        """记录书籍的同步状态"""
+        fingerprint = payload.fingerprint or {}
+        self.state_store.save_book(
+            BookSyncState(
+                book_id=payload.book_info.book_id,
+                notion_page_id=notion_page_id,
+                content_hash=content_hash,
+                **fingerprint
+            ),
+            database_id=self.notion_client.database_id
+        )
+    
+    def _get_entry_title(self, entry: Dict[str, Any]) -> str:
+        """获取书架/笔记本条目中的书名（笔记本条目的书名位于 book 字段内）"""
+        return entry.get('title') or entry.get('book', {}).get('title') or '未知书籍'
     
     async def _build_book_info(self, book_info_raw: Dict[str, Any], read_info: Dict[str, Any]) -> BookInfo:
         """构建书籍信息对象"""
@@ -200,7 +1096,7 @@ class SyncService:
             book_id=book_info_raw.get('bookId', ''),
             title=book_info_raw.get('title', '未知书籍'),
             author=book_info_raw.get('author', '未知作者'),
-            cover=book_info_raw.get('cover', ''),
+            cover=book_info_raw.get('cover', '') if self.filters.sync_book_covers else '',
             category=book_info_raw.get('category', ''),
             isbn=book_info_raw.get('isbn', ''),
             publisher=book_info_raw.get('publisher', ''),
@@ -218,13 +1114,22 @@ class SyncService:
         bookmarks: List[Dict[str, Any]], 
         reviews: List[Dict[str, Any]], 
         chapters: Dict[str, Dict[str, Any]], 
-        book_id: str
+        book_id: str,
+        excluded_ids: Optional[List[str]] = None
     ) -> List[ReadingNote]:
-        """构建读书笔记列表"""
+        """构建读书笔记列表（按筛选条件排除过短或私密的笔记，被排除的笔记 ID 记入 excluded_ids）"""
         notes = []
+        if not self.filters.sync_reading_notes:
+            return notes
         
         # 处理划线记录
         for bookmark in bookmarks:
+            if not self._keep_note(bookmark.get('markText', ''), bookmark.get('isPrivate', False)):
+                self.excluded_notes += 1
+                if excluded_ids is not None:
+                    excluded_ids.append(f"bookmark_{bookmark.get('bookmarkId', '')}")
+                continue
+            
             chapter_uid = str(bookmark.get('chapterUid', ''))
             chapter_info = chapters.get(chapter_uid, {})
             chapter_title = chapter_info.get('title', '未知章节')
@@ -245,6 +1150,12 @@ class SyncService:
         # 处理想法/笔记
         for review in reviews:
             if review.get('type') != 4:  # 跳过书评
+                if not self._keep_note(review.get('content', ''), review.get('isPrivate', False)):
+                    self.excluded_notes += 1
+                    if excluded_ids is not None:
+                        excluded_ids.append(f"review_{review.get('reviewId', '')}")
+                    continue
+                
                 chapter_uid = str(review.get('chapterUid', ''))
                 chapter_info = chapters.get(chapter_uid, {})
                 chapter_title = chapter_info.get('title', '未知章节')
@@ -266,6 +1177,8 @@ class SyncService:
     async def _build_book_reviews(self, reviews: List[Dict[str, Any]], book_id: str) -> List[BookReview]:
         """构建书评列表"""
         book_reviews = []
+        if not self.filters.sync_book_reviews:
+            return book_reviews
         
         for review in reviews:
             if review.get('type') == 4:  # 书评类型
@@ -281,6 +1194,26 @@ class SyncService:
         
         return book_reviews
     
+    async def validate_schema(self):
+        """
+        读取 Notion 数据库结构并校验属性映射（每次运行只读取一次）
+        
+        结构连同版本（数据库最后编辑时间）缓存在本地状态库中，读取失败时使用缓存。
+        
+        Raises:
+            SchemaError: 数据库缺少必需属性或属性类型不匹配
+        """
+        if self.notion_client.schema is not None:
+            return
+        
+        database_id = self.notion_client.database_id
+        cached = self.state_store.get_schema(database_id)
+        schema = await self.notion_client.load_schema(cached)
+        if cached is None or cached.version != schema.version:
+            if cached is not None:
+                self.logger.info("🧬 Notion 数据库结构已变化，已重新校验属性映射")
+            self.state_store.save_schema(schema)
+    
     async def sync_book_by_id(self, book_id: str) -> SyncResult:
         """
         根据书籍 ID 同步单本书籍
@@ -292,6 +1225,11 @@ class SyncService:
             同步结果
         """
         self.logger.info(f"📖 开始同步书籍: {book_id}")
+        await self.validate_schema()
+        
+        # 单本同步无需扫描整个数据库，使用本地索引（未命中时再查询 Notion）
+        await self._load_page_index(full_scan=False)
+        await self._load_highlight_index()
         
         # 检查书籍是否有笔记
         notebooks = await self.weread_client.get_notebook_list()
@@ -306,10 +1244,14 @@ class SyncService:
         
         return result
     
-    async def get_sync_status(self) -> Dict[str, Any]:
+    async def get_sync_status(self, count_pages: bool = True) -> Dict[str, Any]:
         """
         获取同步状态
         
+        Args:
+            count_pages: 是否分页扫描 Notion 数据库统计已同步的书籍；
+                否则使用页面索引（已加载的或本地持久化的），同步前检查时避免多一次完整扫描
+        
         Returns:
             同步状态信息
         """
@@ -319,13 +1261,20 @@ class SyncService:
             entire_shelf = await self.weread_client.get_entire_shelf()
             shelf_books = entire_shelf.get('books', [])
             
-            # 获取 Notion 数据统计
-            notion_books = await self.notion_client.list_all_books()
+            # 获取 Notion 数据统计（流式计数，不在内存中保留页面）
+            if count_pages:
+                notion_book_count = await self.notion_client.count_books()
+            elif self.notion_client.page_index is not None:
+                notion_book_count = len(self.notion_client.page_index)
+            else:
+                notion_book_count = len(self.state_store.load_page_index(self.notion_client.database_id))
             
             return {
                 'weread_books_with_notes': len(notebooks),
                 'weread_total_books': len(shelf_books),
-                'notion_synced_books': len(notion_books),
+                'notion_synced_books': notion_book_count,
+                'weread_rate_limit': self.weread_client.current_rate,
+                'notion_rate_stats': self.notion_client.rate_limiter.stats(),
                 'last_check_time': datetime.now().isoformat()
             }
             
@@ -0,0 +1,582 @@
+import json
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+
+from ..models import BookSyncState, DatabaseSchema, NoteBlockRef, PendingMutation, SyncCheckpoint
+
+
+# 默认状态库位置（与日志目录放在一起）
+DEFAULT_STATE_PATH = "logs/sync_state.db"
+
+
+class SyncStateStore:
+    """本地同步状态存储（SQLite）"""
+
+    def __init__(self, db_path: str = DEFAULT_STATE_PATH):
+        """
+        初始化状态存储
+
+        Args:
+            db_path: SQLite 文件路径，传入 ":memory:" 时仅在内存中保存
+        """
+        self.db_path = db_path
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self):
+        """创建数据表"""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS books (
+                book_id TEXT PRIMARY KEY,
+                database_id TEXT,
+                notion_page_id TEXT,
+                note_count INTEGER,
+                review_count INTEGER,
+                bookmark_count INTEGER,
+                sort INTEGER,
+                update_time INTEGER,
+                read_update_time INTEGER,
+                content_hash TEXT,
+                synced_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS page_index (
+                database_id TEXT NOT NULL,
+                book_id TEXT NOT NULL,
+                page_id TEXT NOT NULL,
+                PRIMARY KEY (database_id, book_id)
+            );
+            CREATE TABLE IF NOT EXISTS tracked_pages (
+                page_id TEXT PRIMARY KEY,
+                tracked_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS page_properties (
+                page_id TEXT PRIMARY KEY,
+                properties TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS notebook_cache (
+                book_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                synckey INTEGER,
+                items TEXT NOT NULL,
+                PRIMARY KEY (book_id, kind)
+            );
+            CREATE TABLE IF NOT EXISTS page_items (
+                page_id TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                PRIMARY KEY (page_id, item_id)
+            );
+            CREATE TABLE IF NOT EXISTS sync_runs (
+                run_id TEXT PRIMARY KEY,
+                database_id TEXT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS run_books (
+                run_id TEXT NOT NULL,
+                book_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (run_id, book_id)
+            );
+            CREATE TABLE IF NOT EXISTS databases (
+                parent_page_id TEXT PRIMARY KEY,
+                database_id TEXT NOT NULL,
+                resolved_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS database_schemas (
+                database_id TEXT PRIMARY KEY,
+                version TEXT,
+                properties TEXT NOT NULL,
+                checked_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS mutations (
+                mutation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                database_id TEXT,
+                book_id TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                payload_hash TEXT,
+                page_id TEXT,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS highlight_books (
+                database_id TEXT NOT NULL,
+                book_id TEXT NOT NULL,
+                synced_at TEXT,
+                PRIMARY KEY (database_id, book_id)
+            );
+        """)
+        self._ensure_columns("page_items", {
+            "block_ids": "TEXT",
+            "content_hash": "TEXT",
+            "inline": "INTEGER DEFAULT 0"
+        })
+        self.conn.commit()
+
+    def _ensure_columns(self, table: str, columns: Dict[str, str]):
+        """为旧版本创建的数据表补充新增的列"""
+        existing = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def get_book(self, book_id: str, database_id: Optional[str] = None) -> Optional[BookSyncState]:
+        """
+        读取书籍的同步状态
+
+        Args:
+            book_id: 书籍 ID
+            database_id: Notion 数据库 ID，提供时只返回同一数据库下的记录
+
+        Returns:
+            同步状态，不存在则返回 None
+        """
+        row = self.conn.execute("SELECT * FROM books WHERE book_id = ?", (book_id,)).fetchone()
+        if row is None:
+            return None
+        if database_id and row["database_id"] != database_id:
+            return None
+        return BookSyncState(
+            book_id=row["book_id"],
+            notion_page_id=row["notion_page_id"],
+            note_count=row["note_count"],
+            review_count=row["review_count"],
+            bookmark_count=row["bookmark_count"],
+            sort=row["sort"],
+            update_time=row["update_time"],
+            read_update_time=row["read_update_time"],
+            content_hash=row["content_hash"],
+            synced_at=row["synced_at"]
+        )
+
+    def save_book(self, state: BookSyncState, database_id: Optional[str] = None):
+        """
+        写入书籍的同步状态
+
+        Args:
+            state: 同步状态
+            database_id: 该状态对应的 Notion 数据库 ID
+        """
+        synced_at = state.synced_at or datetime.now().isoformat()
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO books (
+                book_id, database_id, notion_page_id, note_count, review_count, bookmark_count,
+                sort, update_time, read_update_time, content_hash, synced_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                state.book_id, database_id, state.notion_page_id, state.note_count, state.review_count,
+                state.bookmark_count, state.sort, state.update_time, state.read_update_time,
+                state.content_hash, synced_at
+            )
+        )
+        self.conn.commit()
+
+    def load_page_index(self, database_id: str) -> Dict[str, str]:
+        """
+        读取持久化的书籍ID → 页面 ID 索引
+
+        Args:
+            database_id: Notion 数据库 ID
+
+        Returns:
+            书籍ID → 页面 ID 映射
+        """
+        rows = self.conn.execute(
+            "SELECT book_id, page_id FROM page_index WHERE database_id = ?", (database_id,)
+        ).fetchall()
+        return {row["book_id"]: row["page_id"] for row in rows}
+
+    def save_page_index(self, database_id: str, index: Dict[str, str]):
+        """
+        用完整扫描的结果替换持久化索引
+
+        Args:
+            database_id: Notion 数据库 ID
+            index: 书籍ID → 页面 ID 映射
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM page_index WHERE database_id = ?", (database_id,))
+            self.conn.executemany(
+                "INSERT INTO page_index (database_id, book_id, page_id) VALUES (?, ?, ?)",
+                [(database_id, book_id, page_id) for book_id, page_id in index.items()]
+            )
+
+    def set_page_id(self, database_id: str, book_id: str, page_id: str):
+        """
+        记录单个书籍对应的页面 ID
+
+        Args:
+            database_id: Notion 数据库 ID
+            book_id: 书籍 ID
+            page_id: 页面 ID
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_index (database_id, book_id, page_id) VALUES (?, ?, ?)",
+            (database_id, book_id, page_id)
+        )
+        self.conn.commit()
+
+    def is_highlights_synced(self, database_id: str, book_id: str) -> bool:
+        """
+        判断书籍的划线是否已全部写入划线数据库
+
+        Args:
+            database_id: 划线数据库 ID
+            book_id: 书籍 ID
+        """
+        row = self.conn.execute(
+            "SELECT 1 FROM highlight_books WHERE database_id = ? AND book_id = ?", (database_id, book_id)
+        ).fetchone()
+        return row is not None
+
+    def set_highlights_synced(self, database_id: str, book_id: str, synced: bool):
+        """
+        记录书籍的划线是否已全部写入划线数据库（有写入失败时清除标记，下次同步重试）
+
+        Args:
+            database_id: 划线数据库 ID
+            book_id: 书籍 ID
+            synced: 是否已全部写入
+        """
+        if synced:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO highlight_books (database_id, book_id, synced_at) VALUES (?, ?, ?)",
+                (database_id, book_id, datetime.now().isoformat())
+            )
+        else:
+            self.conn.execute(
+                "DELETE FROM highlight_books WHERE database_id = ? AND book_id = ?", (database_id, book_id)
+            )
+        self.conn.commit()
+
+    def get_page_items(self, page_id: str) -> Optional[Dict[str, NoteBlockRef]]:
+        """
+        读取已写入页面的笔记/书评及其对应的块
+
+        Args:
+            page_id: 页面 ID
+
+        Returns:
+            条目 ID → 块对应关系；页面尚未被追踪时返回 None
+        """
+        tracked = self.conn.execute(
+            "SELECT 1 FROM tracked_pages WHERE page_id = ?", (page_id,)
+        ).fetchone()
+        if tracked is None:
+            return None
+        rows = self.conn.execute(
+            "SELECT item_id, block_ids, content_hash, inline FROM page_items WHERE page_id = ?", (page_id,)
+        ).fetchall()
+        return {
+            row["item_id"]: NoteBlockRef(
+                item_id=row["item_id"],
+                block_ids=json.loads(row["block_ids"]) if row["block_ids"] else [],
+                content_hash=row["content_hash"],
+                inline=bool(row["inline"])
+            )
+            for row in rows
+        }
+
+    def save_page_items(self, page_id: str, refs: Dict[str, NoteBlockRef]):
+        """
+        用当前的对应关系替换页面的条目记录，并将页面标记为已追踪
+
+        Args:
+            page_id: 页面 ID
+            refs: 条目 ID → 块对应关系
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO tracked_pages (page_id, tracked_at) VALUES (?, ?)",
+                (page_id, datetime.now().isoformat())
+            )
+            self.conn.execute("DELETE FROM page_items WHERE page_id = ?", (page_id,))
+            self.conn.executemany(
+                "INSERT INTO page_items (page_id, item_id, block_ids, content_hash, inline) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (page_id, ref.item_id, json.dumps(ref.block_ids), ref.content_hash, int(ref.inline))
+                    for ref in refs.values()
+                ]
+            )
+
+    def get_page_properties(self, page_id: str) -> Optional[Dict[str, Any]]:
+        """
+        读取上次写入页面的属性值
+
+        Args:
+            page_id: 页面 ID
+
+        Returns:
+            属性名 → 属性值；没有记录时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT properties FROM page_properties WHERE page_id = ?", (page_id,)
+        ).fetchone()
+        return json.loads(row["properties"]) if row else None
+
+    def save_page_properties(self, page_id: str, properties: Dict[str, Any]):
+        """
+        记录写入页面的属性值
+
+        Args:
+            page_id: 页面 ID
+            properties: 属性名 → 属性值
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_properties (page_id, properties) VALUES (?, ?)",
+            (page_id, json.dumps(properties, ensure_ascii=False))
+        )
+        self.conn.commit()
+
+    def get_notebook_cache(self, book_id: str, kind: str) -> Optional[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        读取本地缓存的划线/笔记列表
+
+        Args:
+            book_id: 书籍 ID
+            kind: 列表类型（bookmarks 或 reviews）
+
+        Returns:
+            (synckey, 条目列表)；没有缓存时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT synckey, items FROM notebook_cache WHERE book_id = ? AND kind = ?", (book_id, kind)
+        ).fetchone()
+        if row is None:
+            return None
+        return row["synckey"] or 0, json.loads(row["items"])
+
+    def save_notebook_cache(self, book_id: str, kind: str, synckey: int, items: List[Dict[str, Any]]):
+        """
+        写入本地缓存的划线/笔记列表
+
+        Args:
+            book_id: 书籍 ID
+            kind: 列表类型（bookmarks 或 reviews）
+            synckey: 微信读书返回的 synckey
+            items: 合并后的全部条目
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO notebook_cache (book_id, kind, synckey, items) VALUES (?, ?, ?, ?)",
+            (book_id, kind, synckey, json.dumps(items, ensure_ascii=False))
+        )
+        self.conn.commit()
+
+    def open_checkpoint(self, database_id: Optional[str], resume: bool = False) -> SyncCheckpoint:
+        """
+        开始一次同步运行；续跑时沿用最近一次未完成的运行
+
+        开始新运行时删除该数据库此前的全部运行记录（之后只会续跑最新的运行）。
+
+        Args:
+            database_id: Notion 数据库 ID
+            resume: 是否从最近一次未完成的运行继续
+
+        Returns:
+            同步检查点；新运行的已完成/失败列表为空
+        """
+        if resume:
+            row = self.conn.execute(
+                """
+                SELECT run_id FROM sync_runs
+                WHERE database_id IS ? AND finished_at IS NULL
+                ORDER BY started_at DESC LIMIT 1
+                """,
+                (database_id,)
+            ).fetchone()
+            if row is not None:
+                rows = self.conn.execute(
+                    "SELECT book_id, status FROM run_books WHERE run_id = ? ORDER BY updated_at", (row["run_id"],)
+                ).fetchall()
+                return SyncCheckpoint(
+                    run_id=row["run_id"],
+                    completed=[r["book_id"] for r in rows if r["status"] == "completed"],
+                    failed=[r["book_id"] for r in rows if r["status"] == "failed"],
+                    resumed=True
+                )
+
+        run_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with self.conn:
+            # 新运行开始后，此前的运行不再会被续跑，清理掉以免状态库无限增长
+            stale = "SELECT run_id FROM sync_runs WHERE database_id IS ?"
+            self.conn.execute(f"DELETE FROM run_books WHERE run_id IN ({stale})", (database_id,))
+            self.conn.execute("DELETE FROM sync_runs WHERE database_id IS ?", (database_id,))
+            self.conn.execute(
+                "INSERT INTO sync_runs (run_id, database_id, started_at) VALUES (?, ?, ?)",
+                (run_id, database_id, datetime.now().isoformat())
+            )
+        return SyncCheckpoint(run_id=run_id, completed=[], failed=[])
+
+    def record_run_book(self, run_id: str, book_id: str, completed: bool, error: Optional[str] = None):
+        """
+        记录书籍在本次运行中的结果（每本书写入 Notion 后立即落盘）
+
+        Args:
+            run_id: 运行 ID
+            book_id: 书籍 ID
+            completed: 是否已完成（成功或无需更新）
+            error: 失败原因
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO run_books (run_id, book_id, status, error, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (run_id, book_id, "completed" if completed else "failed", error, datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def finish_run(self, run_id: str):
+        """
+        将运行标记为已结束，之后不会再被续跑
+
+        Args:
+            run_id: 运行 ID
+        """
+        self.conn.execute(
+            "UPDATE sync_runs SET finished_at = ? WHERE run_id = ?", (datetime.now().isoformat(), run_id)
+        )
+        self.conn.commit()
+
+    def get_database(self, parent_page_id: str) -> Optional[str]:
+        """
+        读取父页面下已解析的书籍数据库（结构另存于 database_schemas）
+
+        Args:
+            parent_page_id: 父页面 ID
+
+        Returns:
+            数据库 ID，未缓存时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT database_id FROM databases WHERE parent_page_id = ?", (parent_page_id,)
+        ).fetchone()
+        return row["database_id"] if row else None
+
+    def save_database(self, parent_page_id: str, database_id: str):
+        """
+        缓存父页面下解析出的书籍数据库
+
+        Args:
+            parent_page_id: 父页面 ID
+            database_id: 数据库 ID
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO databases (parent_page_id, database_id, resolved_at) VALUES (?, ?, ?)",
+            (parent_page_id, database_id, datetime.now().isoformat())
+        )
+        self.conn.commit()
+
+    def get_schema(self, database_id: str) -> Optional[DatabaseSchema]:
+        """
+        读取缓存的数据库结构
+
+        Args:
+            database_id: Notion 数据库 ID
+
+        Returns:
+            数据库结构，未缓存时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT version, properties FROM database_schemas WHERE database_id = ?", (database_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return DatabaseSchema(database_id=database_id, version=row["version"], properties=json.loads(row["properties"]))
+
+    def save_schema(self, schema: DatabaseSchema):
+        """
+        缓存数据库结构
+
+        Args:
+            schema: 数据库结构
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO database_schemas (database_id, version, properties, checked_at) VALUES (?, ?, ?, ?)",
+            (
+                schema.database_id, schema.version,
+                json.dumps(schema.properties, ensure_ascii=False), datetime.now().isoformat()
+            )
+        )
+        self.conn.commit()
+
+    def begin_mutation(self, database_id: Optional[str], book_id: str, operation: str, payload_hash: str) -> int:
+        """
+        在写入 Notion 之前记录预写日志
+
+        Args:
+            database_id: Notion 数据库 ID
+            book_id: 书籍 ID
+            operation: 操作类型（create / update）
+            payload_hash: 待写入内容的哈希
+
+        Returns:
+            日志 ID
+        """
+        cursor = self.conn.execute(
+            """
+            INSERT INTO mutations (database_id, book_id, operation, payload_hash, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (database_id, book_id, operation, payload_hash, datetime.now().isoformat())
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def set_mutation_page(self, mutation_id: int, page_id: str):
+        """
+        记录操作已创建的页面 ID（页面创建成功、内容尚未写完时调用）
+
+        Args:
+            mutation_id: 日志 ID
+            page_id: 页面 ID
+        """
+        self.conn.execute("UPDATE mutations SET page_id = ? WHERE mutation_id = ?", (page_id, mutation_id))
+        self.conn.commit()
+
+    def complete_mutation(self, mutation_id: int):
+        """
+        确认操作已完成并删除日志
+
+        Args:
+            mutation_id: 日志 ID
+        """
+        self.conn.execute("DELETE FROM mutations WHERE mutation_id = ?", (mutation_id,))
+        self.conn.commit()
+
+    def pending_mutations(self, database_id: Optional[str]) -> List[PendingMutation]:
+        """
+        读取未确认完成的操作（上次运行在写入过程中中断）
+
+        Args:
+            database_id: Notion 数据库 ID
+
+        Returns:
+            按记录顺序排列的待处理操作
+        """
+        rows = self.conn.execute(
+            """
+            SELECT mutation_id, book_id, operation, payload_hash, page_id FROM mutations
+            WHERE database_id IS ? ORDER BY mutation_id
+            """,
+            (database_id,)
+        ).fetchall()
+        return [
+            PendingMutation(
+                mutation_id=row["mutation_id"],
+                book_id=row["book_id"],
+                operation=row["operation"],
+                payload_hash=row["payload_hash"],
+                page_id=row["page_id"]
+            )
+            for row in rows
+        ]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -3,5 +3,19 @@
 """
 
 from .api_client import WeReadApiClient
+from .errors import (
+    WeReadError,
+    AuthExpiredError,
+    ThrottledError,
+    TransientNetworkError,
+    BadPayloadError,
+)
 
-__all__ = ['WeReadApiClient'] 
\ No newline at end of file
+__all__ = [
+    'WeReadApiClient',
+    'WeReadError',
+    'AuthExpiredError',
+    'ThrottledError',
+    'TransientNetworkError',
+    'BadPayloadError',
+]
@@ -1,13 +1,23 @@
 
 
 import asyncio
+import copy
 import json
 import os
 import random
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import httpx
-from aiolimiter import AsyncLimiter
+
+from .errors import (
+    WeReadError,
+    AuthExpiredError,
+    ThrottledError,
+    TransientNetworkError,
+    BadPayloadError,
+)
+from .cache import ResponseCache
+from .rate_limiter import AdaptiveRateLimiter
 
 
 class WeReadApiClient:
@@ -24,18 +34,76 @@ class WeReadApiClient:
     WEREAD_SHELF_SYNC_URL = "https://weread.qq.com/web/shelf/sync"
     WEREAD_BEST_REVIEW_URL = "https://weread.qq.com/web/review/list/best"
     
-    def __init__(self, cookie: str = None, rate_limit: int = 10):
+    # 每次章节请求包含的书籍数量
+    CHAPTER_BATCH_SIZE = 20
+    
+    # 会话相关的错误码（登录超时 / Cookie 过期）
+    SESSION_ERROR_CODES = (-2012, -2010)
+    
+    # 明确表示请求过于频繁的错误码（尚无确认的错误码；-1 等通用失败码不计入，避免误降速率）。
+    # 速率上限默认等于配置的速率，缺少限流信号时也不会超过配置
+    THROTTLE_ERROR_CODES: Tuple[int, ...] = ()
+    
+    # 连续出现多少次服务端错误（5xx）后视为过载并降低速率
+    SERVER_ERROR_THRESHOLD = 2
+    
+    # 请求前的随机延迟范围（秒），在限流许可之外执行
+    REQUEST_JITTER = (0.5, 1.5)
+    
+    # 列表类请求的短期复用时间（秒）
+    MEMO_TTL = 60
+    
+    def __init__(
+        self,
+        cookie: str = None,
+        rate_limit: int = 10,
+        min_rate_limit: Optional[float] = None,
+        max_rate_limit: Optional[float] = None,
+        rate_burst: int = 1,
+        cache: Optional[ResponseCache] = None
+    ):
         """
         初始化微信读书 API 客户端
         
         Args:
             cookie: 微信读书 Cookie
-            rate_limit: 每60秒最多请求次数
+            rate_limit: 每60秒的初始请求次数
+            min_rate_limit: 自适应限流的速率下限（每60秒），默认为 1
+            max_rate_limit: 自适应限流的速率上限（每60秒），默认为初始速率
+            rate_burst: 空闲后允许连续发出的请求数
+            cache: 书籍信息、章节、热门书评等变化缓慢接口的响应缓存，为 None 时不缓存
         """
         self.cookie = cookie or self._get_cookie_from_env()
         self.client: Optional[httpx.AsyncClient] = None
-        self.rate_limiter = AsyncLimiter(max_rate=rate_limit, time_period=60)
+        self.cache = cache
+        self.rate_limiter = AdaptiveRateLimiter(
+            rate=rate_limit,
+            time_period=60,
+            min_rate=min_rate_limit,
+            max_rate=max_rate_limit,
+            burst=rate_burst
+        )
         self.initialized = False
+        
+        # 会话状态：预热一次，仅在章节接口报会话错误时重新预热
+        self.session_ready = False
+        self._session_lock = asyncio.Lock()
+        self._session_notebook: Optional[List[Dict[str, Any]]] = None
+        
+        # 熔断：出现登录失效后不再发出任何请求
+        self.circuit_open = False
+        
+        # 连续的服务端错误次数（成功响应后清零）
+        self._server_errors = 0
+        
+        # 相同请求合并：进行中的请求及短期复用的响应
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._memo: Dict[str, Tuple[float, Any]] = {}
+    
+    @property
+    def current_rate(self) -> float:
+        """当前生效的请求速率（每60秒请求次数）"""
+        return self.rate_limiter.current_rate
     
     def _get_cookie_from_env(self) -> str:
         """从环境变量获取 Cookie"""
@@ -80,10 +148,13 @@ class WeReadApiClient:
             'Sec-Fetch-Site': 'same-origin',
         }
     
-    def _handle_error_code(self, errcode: int):
-        """处理错误码"""
-        if errcode in [-2012, -2010]:
-            raise Exception("微信读书Cookie过期了，请重新设置")
+    def _handle_error_code(self, errcode: int, errmsg: str = 'Unknown error'):
+        """将错误码转换为对应的异常"""
+        if errcode in self.SESSION_ERROR_CODES:
+            raise AuthExpiredError("微信读书Cookie过期了，请重新设置", errcode=errcode)
+        if errcode in self.THROTTLE_ERROR_CODES:
+            raise ThrottledError(f"请求过于频繁: {errmsg} (code: {errcode})", errcode=errcode)
+        raise BadPayloadError(f"API 返回错误: {errmsg} (code: {errcode})", errcode=errcode)
     
     async def _make_request(
         self, 
@@ -91,85 +162,259 @@ class WeReadApiClient:
         url: str, 
         params: Dict[str, Any] = None, 
         data: Any = None,
-        max_retries: int = 3
+        max_retries: int = 3,
+        trip_breaker: bool = True,
+        memo: bool = False
     ) -> Dict[str, Any]:
-        """发送 HTTP 请求"""
+        """
+        发送 HTTP 请求
+        
+        相同的请求（方法、地址、参数、请求体一致）同时进行时只发送一次，并发的调用方共享响应；
+        ``memo`` 为 True 时响应还会在 ``MEMO_TTL`` 秒内被复用。
+        
+        只有限流和临时网络错误会按指数退避重试；登录失效会打开熔断，
+        之后的所有请求都直接失败。
+        
+        Args:
+            method: 请求方法
+            url: 请求地址
+            params: 查询参数
+            data: POST 请求体
+            max_retries: 最多尝试次数
+            trip_breaker: 登录失效时是否打开熔断（调用方会自行重新初始化会话时传 False）
+            memo: 是否短期复用响应（适用于列表类请求）
+            
+        Returns:
+            响应 JSON
+        """
+        if self.circuit_open:
+            raise AuthExpiredError("微信读书登录已失效，已停止后续请求")
+        
+        key = self._request_key(method, url, params, data)
+        
+        if memo and key in self._memo:
+            expires_at, result = self._memo[key]
+            if expires_at > time.monotonic():
+                return copy.deepcopy(result)
+            del self._memo[key]
+        
+        # 已有相同请求在进行中，等待其结果
+        if key in self._inflight:
+            result = await asyncio.shield(self._inflight[key])
+            return copy.deepcopy(result)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._request_with_retries(method, url, dict(params or {}), data, max_retries, trip_breaker)
+        except asyncio.CancelledError:
+            # 不向等待中的调用方传播取消，改为可重试的错误
+            future.set_exception(TransientNetworkError("合并的请求已被取消，请重试"))
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他调用方等待时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        
+        # 等待方拿到独立的副本，避免修改发起方返回的对象
+        future.set_result(copy.deepcopy(result))
+        if memo:
+            self._memo[key] = (time.monotonic() + self.MEMO_TTL, copy.deepcopy(result))
+        return result
+    
+    def _request_key(self, method: str, url: str, params: Optional[Dict[str, Any]], data: Any) -> str:
+        """构建请求合并用的键（忽略防缓存的时间戳参数）"""
+        params = {k: v for k, v in (params or {}).items() if k != '_'}
+        return json.dumps([method.upper(), url, params, data], sort_keys=True, ensure_ascii=False, default=str)
+    
+    async def _request_with_retries(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, Any],
+        data: Any,
+        max_retries: int,
+        trip_breaker: bool
+    ) -> Dict[str, Any]:
+        """发送请求，并对可重试的错误按指数退避重试"""
         if not self.initialized:
             await self._init_client()
         
         # 添加时间戳避免缓存
-        if params is None:
-            params = {}
         if method.upper() == 'GET':
             params['_'] = int(time.time() * 1000)
         
         for attempt in range(max_retries):
             try:
-                async with self.rate_limiter:
-                    # 添加随机延迟，模拟人类行为
-                    await asyncio.sleep(random.uniform(0.5, 1.5))
-                    
-                    if method.upper() == 'GET':
-                        response = await self.client.get(url, params=params)
-                    else:
-                        headers = {'Content-Type': 'application/json;charset=UTF-8'}
-                        response = await self.client.post(
-                            url, 
-                            params=params, 
-                            json=data, 
-                            headers=headers
-                        )
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    # 检查错误码
-                    if 'errcode' in result and result['errcode'] != 0:
-                        self._handle_error_code(result['errcode'])
-                        raise Exception(f"API 返回错误: {result.get('errmsg', 'Unknown error')} (code: {result['errcode']})")
-                    
-                    return result
-                    
-            except Exception as e:
-                if attempt == max_retries - 1:
+                result = await self._send(method, url, params, data)
+                self._server_errors = 0
+                self.rate_limiter.on_success()
+                return result
+                
+            except AuthExpiredError:
+                if trip_breaker:
+                    self.circuit_open = True
+                raise
+            except WeReadError as e:
+                if not e.retryable or attempt == max_retries - 1:
                     raise
                 
                 wait_time = (2 ** attempt) + random.uniform(1, 3)
-                print(f"请求失败，{wait_time:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries})")
+                print(f"请求失败（{e}），{wait_time:.1f}秒后重试... (尝试 {attempt + 1}/{max_retries}，当前速率 {self.current_rate:.1f} 次/分钟)")
                 await asyncio.sleep(wait_time)
     
+    async def _send(self, method: str, url: str, params: Dict[str, Any], data: Any) -> Dict[str, Any]:
+        """发送单次请求，并将失败归类为对应的异常"""
+        await self.rate_limiter.acquire()
+        
+        # 添加随机延迟，模拟人类行为（不占用限流许可）
+        await asyncio.sleep(random.uniform(*self.REQUEST_JITTER))
+        
+        try:
+            if method.upper() == 'GET':
+                response = await self.client.get(url, params=params)
+            else:
+                headers = {'Content-Type': 'application/json;charset=UTF-8'}
+                response = await self.client.post(
+                    url, 
+                    params=params, 
+                    json=data, 
+                    headers=headers
+                )
+        except httpx.TransportError as e:
+            raise TransientNetworkError(f"网络请求失败: {e!r}") from e
+        
+        status = response.status_code
+        if status == 401:
+            raise AuthExpiredError("微信读书Cookie过期了，请重新设置", status=status)
+        if status == 429:
+            self.rate_limiter.on_throttle()
+            raise ThrottledError("请求过于频繁 (HTTP 429)", status=status)
+        if status >= 500:
+            # 偶发的服务端故障只重试；连续出现时视为过载，降低速率
+            self._server_errors += 1
+            if self._server_errors >= self.SERVER_ERROR_THRESHOLD:
+                self.rate_limiter.on_throttle()
+            raise TransientNetworkError(f"服务端错误 (HTTP {status})", status=status)
+        if status >= 400:
+            raise BadPayloadError(f"请求被拒绝 (HTTP {status})", status=status)
+        
+        try:
+            result = response.json()
+        except ValueError as e:
+            raise BadPayloadError(f"响应不是有效的 JSON: {response.text[:100]}", status=status) from e
+        
+        # 检查错误码
+        if isinstance(result, dict) and result.get('errcode', 0) != 0:
+            if result['errcode'] in self.THROTTLE_ERROR_CODES:
+                self.rate_limiter.on_throttle()
+            self._handle_error_code(result['errcode'], result.get('errmsg', 'Unknown error'))
+        
+        return result
+    
     async def visit_homepage(self):
         """访问主页，初始化会话"""
+        if not self.initialized:
+            await self._init_client()
         try:
             await self.client.get(self.WEREAD_URL)
         except Exception as e:
             print(f"访问主页失败: {e}")
     
+    async def ensure_session(self, refresh: bool = False):
+        """
+        预热会话：访问主页并获取笔记本列表
+        
+        每个客户端生命周期内只预热一次；预热得到的笔记本列表会保留给下一次
+        get_notebook_list 使用，避免重复请求。
+        
+        Args:
+            refresh: 是否强制重新预热（会话失效时使用）
+        """
+        async with self._session_lock:
+            if self.session_ready and not refresh:
+                return
+            
+            await self.visit_homepage()
+            data = await self._make_request('GET', self.WEREAD_NOTEBOOKS_URL, memo=not refresh)
+            self._session_notebook = data.get('books', [])
+            self.session_ready = True
+            
+            # 预热后稍作停顿，模拟人类行为
+            await asyncio.sleep(random.uniform(1, 3))
+    
+    def invalidate_session(self):
+        """标记会话失效，下次需要时重新预热"""
+        self.session_ready = False
+    
     async def get_bookshelf(self) -> Dict[str, Any]:
         """获取书架信息（存在笔记的书籍）"""
-        return await self._make_request('GET', self.WEREAD_NOTEBOOKS_URL)
+        return await self._make_request('GET', self.WEREAD_NOTEBOOKS_URL, memo=True)
     
     async def get_entire_shelf(self) -> Dict[str, Any]:
         """获取所有书架书籍信息"""
-        return await self._make_request('GET', self.WEREAD_SHELF_SYNC_URL)
+        return await self._make_request('GET', self.WEREAD_SHELF_SYNC_URL, memo=True)
     
     async def get_notebook_list(self) -> List[Dict[str, Any]]:
-        """获取笔记本列表"""
-        data = await self._make_request('GET', self.WEREAD_NOTEBOOKS_URL)
+        """获取笔记本列表（首次调用时顺带完成会话预热）"""
+        if not self.session_ready:
+            await self.ensure_session()
+        
+        # 优先使用预热时获取的列表
+        if self._session_notebook is not None:
+            books, self._session_notebook = self._session_notebook, None
+            return books
+        
+        data = await self._make_request('GET', self.WEREAD_NOTEBOOKS_URL, memo=True)
         return data.get('books', [])
     
     async def get_book_info(self, book_id: str) -> Dict[str, Any]:
-        """获取书籍信息"""
+        """获取书籍信息（优先读取缓存）"""
+        key = ResponseCache.make_key('book_info', book_id)
+        if self.cache is not None:
+            cached = self.cache.get('book_info', key)
+            if cached is not None:
+                return cached
+        
         params = {'bookId': book_id}
-        return await self._make_request('GET', self.WEREAD_BOOK_INFO_URL, params=params)
+        result = await self._make_request('GET', self.WEREAD_BOOK_INFO_URL, params=params)
+        
+        if self.cache is not None:
+            self.cache.set('book_info', key, result)
+        return result
     
     async def get_bookmark_list(self, book_id: str) -> List[Dict[str, Any]]:
         """获取书籍的划线记录"""
+        changes = await self.get_bookmark_changes(book_id)
+        return changes['updated']
+    
+    async def get_bookmark_changes(self, book_id: str, synckey: int = 0) -> Dict[str, Any]:
+        """
+        获取书籍划线的增量变化
+        
+        Args:
+            book_id: 书籍 ID
+            synckey: 上次返回的 synckey，为 0 时返回全部划线
+            
+        Returns:
+            包含 synckey、updated（新增或修改的划线）、removed（已删除的划线 ID）的字典；
+            响应中没有 synckey 时表示接口返回的是全量数据
+        """
         params = {'bookId': book_id}
+        if synckey:
+            params['synckey'] = synckey
         data = await self._make_request('GET', self.WEREAD_BOOKMARKLIST_URL, params=params)
         bookmarks = data.get('updated', [])
-        # 过滤有效的划线记录
-        return [mark for mark in bookmarks if mark.get('markText') and mark.get('chapterUid')]
+        return {
+            'synckey': data.get('synckey'),
+            # 过滤有效的划线记录
+            'updated': [mark for mark in bookmarks if mark.get('markText') and mark.get('chapterUid')],
+            'removed': data.get('removed', [])
+        }
     
     async def get_read_info(self, book_id: str) -> Dict[str, Any]:
         """获取阅读进度"""
@@ -178,13 +423,28 @@ class WeReadApiClient:
     
     async def get_review_list(self, book_id: str) -> List[Dict[str, Any]]:
         """获取笔记/想法列表"""
+        changes = await self.get_review_changes(book_id)
+        return changes['updated']
+    
+    async def get_review_changes(self, book_id: str, synckey: int = 0) -> Dict[str, Any]:
+        """
+        获取笔记/想法的增量变化
+        
+        Args:
+            book_id: 书籍 ID
+            synckey: 上次返回的 synckey，为 0 时返回全部笔记
+            
+        Returns:
+            包含 synckey、updated（新增或修改的笔记）、removed（已删除的笔记 ID）的字典；
+            响应中没有 synckey 时表示接口返回的是全量数据
+        """
         params = {
             'bookId': book_id,
             'listType': 4,
             'maxIdx': 0,
             'count': 0,
             'listMode': 2,
-            'syncKey': 0
+            'syncKey': synckey
         }
         data = await self._make_request('GET', self.WEREAD_REVIEW_LIST_URL, params=params)
         reviews = data.get('reviews', [])
@@ -197,7 +457,11 @@ class WeReadApiClient:
             if review.get('type') == 4:
                 review['chapterUid'] = 1000000
         
-        return reviews
+        return {
+            'synckey': data.get('synckey', data.get('syncKey')),
+            'updated': reviews,
+            'removed': data.get('removed', [])
+        }
     
     async def get_best_reviews(
         self, 
@@ -206,54 +470,142 @@ class WeReadApiClient:
         max_idx: int = 0, 
         sync_key: int = 0
     ) -> Dict[str, Any]:
-        """获取热门书评"""
+        """获取热门书评（优先读取缓存）"""
+        key = ResponseCache.make_key('best_reviews', book_id, count, max_idx, sync_key)
+        if self.cache is not None:
+            cached = self.cache.get('best_reviews', key)
+            if cached is not None:
+                return cached
+        
         params = {
             'bookId': book_id,
             'synckey': sync_key,
             'maxIdx': max_idx,
             'count': count
         }
-        return await self._make_request('GET', self.WEREAD_BEST_REVIEW_URL, params=params)
+        result = await self._make_request('GET', self.WEREAD_BEST_REVIEW_URL, params=params)
+        
+        if self.cache is not None:
+            self.cache.set('best_reviews', key, result)
+        return result
+    
+    async def get_chapter_info(self, book_id: str, version: Any = None) -> Dict[str, Dict[str, Any]]:
+        """
+        获取章节信息
+        
+        Args:
+            book_id: 书籍 ID
+            version: 书籍的 updateTime，与缓存时不一致则重新获取
+            
+        Returns:
+            章节 UID → 章节信息
+        """
+        versions = {book_id: version} if version is not None else None
+        chapters = await self.get_chapter_infos([book_id], versions=versions)
+        if book_id not in chapters:
+            raise BadPayloadError("获取章节信息失败，返回格式不符合预期")
+        return chapters[book_id]
     
-    async def get_chapter_info(self, book_id: str) -> Dict[str, Dict[str, Any]]:
-        """获取章节信息"""
-        # 先访问主页和获取笔记列表，初始化会话
-        await self.visit_homepage()
-        await self.get_notebook_list()
+    async def get_chapter_infos(
+        self,
+        book_ids: List[str],
+        batch_size: int = CHAPTER_BATCH_SIZE,
+        versions: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        批量获取多本书的章节信息
+        
+        Args:
+            book_ids: 书籍 ID 列表
+            batch_size: 每次请求包含的书籍数量
+            versions: 书籍 ID → updateTime；书籍更新后缓存的章节会失效
+            
+        Returns:
+            书籍 ID → (章节 UID → 章节信息)；未返回章节的书籍不会出现在结果中
+        """
+        versions = versions or {}
+        chapters: Dict[str, Dict[str, Dict[str, Any]]] = {}
         
-        # 添加随机延迟
-        await asyncio.sleep(random.uniform(1, 3))
+        # 先从缓存读取，只请求未命中的书籍
+        missing = []
+        for book_id in book_ids:
+            cached = None
+            if self.cache is not None:
+                key = ResponseCache.make_key('chapter_info', book_id)
+                cached = self.cache.get('chapter_info', key, version=versions.get(book_id))
+            if cached is not None:
+                chapters[book_id] = cached
+            else:
+                missing.append(book_id)
         
-        # 请求章节信息
-        data = {'bookIds': [book_id]}
-        result = await self._make_request('POST', self.WEREAD_CHAPTER_INFO_URL, data=data)
+        if not missing:
+            return chapters
+        
+        # 章节接口依赖已预热的会话
+        await self.ensure_session()
+        
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i:i + batch_size]
+            
+            # 请求章节信息
+            data = {'bookIds': batch}
+            try:
+                result = await self._make_request(
+                    'POST', self.WEREAD_CHAPTER_INFO_URL, data=data, trip_breaker=False
+                )
+            except AuthExpiredError:
+                # 会话可能已超时，重新预热后重试一次；仍失败说明 Cookie 已过期
+                print("章节接口会话失效，重新初始化会话...")
+                self.invalidate_session()
+                await self.ensure_session(refresh=True)
+                result = await self._make_request('POST', self.WEREAD_CHAPTER_INFO_URL, data=data)
+            
+            for book_id, update in self._parse_chapter_infos(result, batch).items():
+                # 添加点评章节
+                update.append({
+                    'chapterUid': 1000000,
+                    'chapterIdx': 1000000,
+                    'updateTime': 1683825006,
+                    'readAhead': 0,
+                    'title': '点评',
+                    'level': 1
+                })
+                
+                # 转换为字典格式
+                chapters[book_id] = {str(chapter['chapterUid']): chapter for chapter in update}
+                
+                if self.cache is not None:
+                    key = ResponseCache.make_key('chapter_info', book_id)
+                    self.cache.set('chapter_info', key, chapters[book_id], version=versions.get(book_id))
+        
+        return chapters
+    
+    def _parse_chapter_infos(self, result: Any, book_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """解析章节接口的不同响应格式，返回书籍 ID → 章节列表"""
+        if isinstance(result, dict) and isinstance(result.get('data'), list):
+            updates = {}
+            for index, entry in enumerate(result['data']):
+                if not entry.get('updated'):
+                    continue
+                # 单本请求时响应可能不带 bookId
+                book_id = str(entry.get('bookId') or (book_ids[index] if len(book_ids) == 1 else ''))
+                if book_id:
+                    updates[book_id] = entry['updated']
+            return updates
+        
+        # 以下格式只会出现在单本请求中
+        if len(book_ids) != 1:
+            return {}
         
-        # 处理不同的响应格式
         update = None
-        if result.get('data') and len(result['data']) == 1 and result['data'][0].get('updated'):
-            update = result['data'][0]['updated']
-        elif result.get('updated') and isinstance(result['updated'], list):
+        if isinstance(result, dict) and isinstance(result.get('updated'), list):
             update = result['updated']
         elif isinstance(result, list) and len(result) > 0 and result[0].get('updated'):
             update = result[0]['updated']
         elif isinstance(result, list) and len(result) > 0 and result[0].get('chapterUid'):
             update = result
         
-        if update:
-            # 添加点评章节
-            update.append({
-                'chapterUid': 1000000,
-                'chapterIdx': 1000000,
-                'updateTime': 1683825006,
-                'readAhead': 0,
-                'title': '点评',
-                'level': 1
-            })
-            
-            # 转换为字典格式
-            return {str(chapter['chapterUid']): chapter for chapter in update}
-        else:
-            raise Exception("获取章节信息失败，返回格式不符合预期")
+        return {book_ids[0]: update} if update else {}
     
     async def close(self):
         """关闭客户端"""
@@ -261,6 +613,9 @@ class WeReadApiClient:
             await self.client.aclose()
             self.client = None
             self.initialized = False
+            self.session_ready = False
+            self._session_notebook = None
+            self._memo.clear()
 
 
 # 使用示例
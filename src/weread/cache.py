@@ -0,0 +1,134 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+# 默认缓存文件位置（与同步状态库放在一起）
+DEFAULT_CACHE_PATH = "logs/weread_cache.db"
+
+
+class ResponseCache:
+    """微信读书接口响应的本地缓存（SQLite，按接口设置过期时间，超出容量时按最近最少使用淘汰）"""
+
+    # 各接口的默认过期时间（秒）；未列出的接口使用 default_ttl
+    DEFAULT_TTLS = {
+        'book_info': 7 * 24 * 3600,
+        'chapter_info': 30 * 24 * 3600,
+    }
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_CACHE_PATH,
+        default_ttl: int = 3600,
+        ttls: Optional[Dict[str, int]] = None,
+        max_entries: int = 5000
+    ):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite 文件路径，传入 ":memory:" 时仅在内存中保存
+            default_ttl: 默认过期时间（秒）
+            ttls: 按接口覆盖的过期时间（秒）
+            max_entries: 最多保留的条目数
+        """
+        self.db_path = db_path
+        self.default_ttl = default_ttl
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                version TEXT,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(endpoint: str, *parts: Any) -> str:
+        """构建缓存键"""
+        return ":".join([endpoint, *(str(part) for part in parts)])
+
+    def get(self, endpoint: str, key: str, version: Any = None) -> Optional[Any]:
+        """
+        读取缓存
+
+        Args:
+            endpoint: 接口名
+            key: 缓存键
+            version: 数据版本（如书籍的 updateTime），与写入时不一致视为失效
+
+        Returns:
+            缓存的响应，未命中、过期或版本不一致时返回 None
+        """
+        row = self.conn.execute(
+            "SELECT value, version, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+
+        if row is None:
+            self.misses += 1
+            return None
+        if row["expires_at"] <= now or (version is not None and row["version"] != str(version)):
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.conn.commit()
+            self.misses += 1
+            return None
+
+        self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        self.hits += 1
+        return json.loads(row["value"])
+
+    def set(self, endpoint: str, key: str, value: Any, version: Any = None):
+        """
+        写入缓存
+
+        Args:
+            endpoint: 接口名（决定过期时间）
+            key: 缓存键
+            value: 响应数据（需可 JSON 序列化）
+            version: 数据版本
+        """
+        now = time.time()
+        ttl = self.ttls.get(endpoint, self.default_ttl)
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO responses (key, endpoint, value, version, expires_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key, endpoint, json.dumps(value, ensure_ascii=False),
+                None if version is None else str(version), now + ttl, now
+            )
+        )
+        self._evict(now)
+        self.conn.commit()
+
+    def _evict(self, now: float):
+        """清理过期条目，并在超出容量时淘汰最久未访问的条目"""
+        self.conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
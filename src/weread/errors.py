@@ -0,0 +1,39 @@
+from typing import Optional
+
+
+class WeReadError(Exception):
+    """微信读书 API 错误基类"""
+
+    # 是否值得重试
+    retryable = False
+
+    def __init__(self, message: str, errcode: Optional[int] = None, status: Optional[int] = None):
+        """
+        Args:
+            message: 错误信息
+            errcode: 微信读书返回的错误码
+            status: HTTP 状态码
+        """
+        super().__init__(message)
+        self.errcode = errcode
+        self.status = status
+
+
+class AuthExpiredError(WeReadError):
+    """登录态失效（Cookie 过期或登录超时），重试无意义"""
+
+
+class ThrottledError(WeReadError):
+    """请求过于频繁被限流"""
+
+    retryable = True
+
+
+class TransientNetworkError(WeReadError):
+    """网络超时、连接失败或服务端 5xx 等临时错误"""
+
+    retryable = True
+
+
+class BadPayloadError(WeReadError):
+    """响应无法解析或接口拒绝了请求内容"""
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD 自适应限流器
+
+    请求成功时按固定步长加性提高速率，遇到限流（HTTP 429、连续的 5xx 或已知的限流错误码）时按比例乘性降低速率。
+    获取许可只在锁内预约下一个发送时刻，等待在锁外进行，不会阻塞其他请求的预约。
+    空闲之后允许最多 burst 个请求连续发出，之后恢复按间隔发送。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        time_period: float = 60,
+        min_rate: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        increase_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        burst: int = 1
+    ):
+        """
+        初始化限流器
+
+        Args:
+            rate: 初始速率（每个时间窗口内的请求次数）
+            time_period: 时间窗口（秒）
+            min_rate: 速率下限，默认为 1
+            max_rate: 速率上限，默认为初始速率（不会超过配置的速率）
+            increase_step: 每次成功后增加的速率
+            decrease_factor: 限流时速率的缩放比例
+            burst: 空闲后允许连续发出的请求数，默认为 1（不允许突发）
+        """
+        self.time_period = time_period
+        self.min_rate = max(0.1, min_rate if min_rate is not None else 1)
+        self.max_rate = max(self.min_rate, max_rate if max_rate is not None else rate)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.burst = max(1, int(burst))
+        self._rate = min(self.max_rate, max(self.min_rate, rate))
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+        # 统计信息
+        self.successes = 0
+        self.throttles = 0
+
+    @property
+    def current_rate(self) -> float:
+        """当前生效的速率（每个时间窗口内的请求次数）"""
+        return self._rate
+
+    @property
+    def interval(self) -> float:
+        """当前速率下两次请求的最小间隔（秒）"""
+        return self.time_period / self._rate
+
+    async def acquire(self):
+        """等待直到允许发送下一个请求"""
+        async with self._lock:
+            now = time.monotonic()
+            # 发送时刻最多可以落后当前时间 burst - 1 个间隔，空闲积累的额度允许连续发送
+            slot = max(now - (self.burst - 1) * self.interval, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        """请求成功：加性提高速率"""
+        self.successes += 1
+        self._rate = min(self.max_rate, self._rate + self.increase_step)
+
+    def on_throttle(self):
+        """请求被限流：乘性降低速率，并推迟下一个发送时刻（同时清空突发额度）"""
+        self.throttles += 1
+        self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+        self._next_slot = max(self._next_slot, time.monotonic() + self.interval)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return None
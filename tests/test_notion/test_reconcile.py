@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from src.models import NoteBlockRef, ReadingNote, SyncFilters
+from src.notion.reconcile import NOTES_HEADING, build_page_items, plan_reconciliation
+from src.sync.service import SyncService
+
+
+def make_note(note_id: str, content: str, chapter: str = "第一章") -> ReadingNote:
+    return ReadingNote(
+        note_id=note_id,
+        book_id="b1",
+        chapter_title=chapter,
+        chapter_uid="1",
+        content=content,
+        note_type="bookmark",
+        create_time=datetime(2024, 1, 1)
+    )
+
+
+def make_ref(note: ReadingNote, *block_ids: str, inline: bool = False) -> NoteBlockRef:
+    """已写入页面、内容未变化的条目"""
+    item = build_page_items([note], [])[0]
+    return NoteBlockRef(item_id=note.note_id, block_ids=list(block_ids), content_hash=item.content_hash, inline=inline)
+
+
+def test_deletes_blocks_of_removed_items():
+    kept = make_note("a", "保留")
+    removed = make_note("b", "已删除")
+    known = {"a": make_ref(kept, "blk_a"), "b": make_ref(removed, "blk_b1", "blk_b2")}
+
+    plan = plan_reconciliation(build_page_items([kept], []), known)
+
+    assert plan.deletes == ["blk_b1", "blk_b2"]
+    assert list(plan.kept) == ["a"]
+    assert not plan.updates and not plan.inserts and not plan.tail
+
+
+def test_updates_edited_item_in_place():
+    original = make_note("a", "原文")
+    known = {"a": make_ref(original, "blk_a")}
+    edited = make_note("a", "修改后")
+
+    plan = plan_reconciliation(build_page_items([edited], []), known)
+
+    assert not plan.deletes
+    assert [(item.item_id, ref.block_ids) for item, ref in plan.updates] == [("a", ["blk_a"])]
+
+
+def test_inserts_new_item_after_anchor_with_its_rendering():
+    first = make_note("a", "第一条")
+    new = make_note("b", "新增")
+    known = {"a": make_ref(first, "blk_a", inline=True)}
+
+    plan = plan_reconciliation(build_page_items([first, new], []), known)
+
+    assert len(plan.inserts) == 1
+    run = plan.inserts[0]
+    assert run.anchor == "blk_a"
+    assert run.inline is True
+    assert [item.item_id for item in run.items] == ["b"]
+    assert not plan.tail
+
+
+def test_appends_item_without_anchor_to_tail():
+    first = make_note("a", "第一条")
+    new = make_note("b", "新章节", chapter="第二章")
+    known = {"a": make_ref(first, "blk_a")}
+
+    plan = plan_reconciliation(build_page_items([first, new], []), known)
+
+    assert not plan.inserts
+    assert [item.item_id for item in plan.tail] == ["b"]
+
+
+def test_keeps_notes_heading_out_of_deletes():
+    note = make_note("a", "第一条")
+    heading = NoteBlockRef(item_id=NOTES_HEADING, block_ids=["blk_heading"], content_hash="x")
+    known = {"a": make_ref(note, "blk_a"), NOTES_HEADING: heading}
+
+    plan = plan_reconciliation(build_page_items([note], []), known)
+
+    assert plan.is_empty
+
+
+def test_excluded_item_is_protected_from_deletion():
+    visible = make_note("a", "保留")
+    excluded = make_note("b", "太短")
+    known = {"a": make_ref(visible, "blk_a"), "b": make_ref(excluded, "blk_b")}
+
+    service = SyncService("cookie", "token", "db", state_path=":memory:", filters=SyncFilters(min_note_length=3))
+    try:
+        protected = service._protected_items(known, [visible], [], ["b"])
+        active = {item_id: ref for item_id, ref in known.items() if item_id not in protected}
+        plan = plan_reconciliation(build_page_items([visible], []), active)
+    finally:
+        service.state_store.close()
+
+    assert protected == {"b"}
+    assert plan.is_empty
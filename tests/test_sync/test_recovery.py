@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Dict, List
+
+from src.models import PendingMutation
+from src.sync.service import SyncService
+
+
+class FakeNotion:
+    """只记录归档与查询调用的 Notion 客户端"""
+
+    def __init__(self, pages: List[str] = None):
+        self.database_id = "db"
+        self.pages = pages or []
+        self.archived: List[str] = []
+        self.queries: List[str] = []
+
+    async def find_book_pages(self, book_id: str) -> List[Dict[str, Any]]:
+        self.queries.append(book_id)
+        return [{"id": page_id} for page_id in self.pages]
+
+    async def archive_page(self, page_id: str):
+        self.archived.append(page_id)
+
+
+def make_service(notion: FakeNotion) -> SyncService:
+    service = SyncService("cookie", "token", "db", state_path=":memory:")
+    service.notion_client = notion
+    return service
+
+
+def test_recorded_page_is_archived_without_query():
+    notion = FakeNotion(pages=["confirmed", "orphan"])
+    service = make_service(notion)
+    mutation = PendingMutation(mutation_id=1, book_id="b1", operation="create", payload_hash="h", page_id="orphan")
+
+    asyncio.run(service._recover_create(mutation, "confirmed"))
+
+    assert notion.archived == ["orphan"]
+    assert notion.queries == []
+
+
+def test_recorded_page_that_was_confirmed_is_kept():
+    notion = FakeNotion(pages=["confirmed"])
+    service = make_service(notion)
+    mutation = PendingMutation(mutation_id=1, book_id="b1", operation="create", payload_hash="h", page_id="confirmed")
+
+    asyncio.run(service._recover_create(mutation, "confirmed"))
+
+    assert notion.archived == []
+    assert notion.queries == []
+
+
+def test_unrecorded_page_is_found_by_query_and_archived():
+    notion = FakeNotion(pages=["confirmed", "orphan1", "orphan2"])
+    service = make_service(notion)
+    mutation = PendingMutation(mutation_id=1, book_id="b1", operation="create", payload_hash="h")
+
+    asyncio.run(service._recover_create(mutation, "confirmed"))
+
+    assert notion.queries == ["b1"]
+    assert notion.archived == ["orphan1", "orphan2"]
+
+
+def test_recover_mutations_completes_pending_create():
+    notion = FakeNotion()
+    service = make_service(notion)
+    store = service.state_store
+    mutation_id = store.begin_mutation("db", "b1", "create", "h")
+    store.set_mutation_page(mutation_id, "orphan")
+
+    asyncio.run(service._recover_mutations())
+
+    assert notion.archived == ["orphan"]
+    assert store.pending_mutations("db") == []